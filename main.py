@@ -3,6 +3,7 @@ import sys
 import os
 from datetime import datetime  # 添加这行导入语句
 import random  # 添加随机数模块
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
 
@@ -20,11 +21,30 @@ from PySide6.QtWidgets import (QComboBox, QLabel, QVBoxLayout, QHBoxLayout,
                              QWidget, QCheckBox, QListView, QPushButton, 
                              QFrame, QScrollArea, QTextEdit, QFileDialog,
                              QMainWindow, QGridLayout, QCalendarWidget)
-from PySide6.QtCore import Qt, QSize, QDate
+from PySide6.QtCore import Qt, QSize, QDate, QTimer, Signal
 from PySide6.QtGui import (QPixmap, QCursor, QWheelEvent, QPainter, QColor, 
-                          QPen, QBrush, QFont, QStandardItemModel, QStandardItem)
+                          QPen, QBrush, QFont, QStandardItemModel, QStandardItem,
+                          QKeySequence, QShortcut)
 from modules.OtherView.CustomMessagebox import CustomMessageBox
+from modules.OtherView.PerfHudView import PerfHudView
 from modules.Script.genReportRTemplate import generate_report_with_images
+from modules.Script.picCompare import PicCompareEngine
+from modules.Script.drawingIndex import DrawingIndex
+from modules.Script.pdfExport import PdfConverter
+from modules.Script.fileOps import FileOpsService
+from modules.Script.reportArchive import ReportArchive
+from modules.Script import perfTrace
+from modules.Script.perfTrace import trace
+from modules.Script import sqlProfiler
+from modules.Script.stallWatchdog import StallWatchdog
+from modules.Script.memProfile import MemoryProfiler
+from modules.Script.imageCache import image_cache
+from modules.Script.skuPrefetch import SkuPrefetcher, prefetch_store
+from modules.Script.dbService import DB_SERVICE_ENV, RemoteDatabaseManager, create_database_manager
+from modules.Script.skuReimport import reimport_drawing
+from modules.Script.localReplica import LocalReplica
+from modules.Script.changeBus import (change_bus, FlowStatusChanged,
+                                      DrawingImported, SkuDeleted)
 
 
 
@@ -36,9 +56,11 @@ widgets = None
 
 
 class ImageViewer(QMainWindow):
-    def __init__(self, image_path):
+    def __init__(self, image_path=None):
         super().__init__()
         self.scale_factor = 1.0
+        self.image_path = None
+        self.pixmap = QPixmap()
 
         # 创建滚动区域
         self.scroll_area = QScrollArea()
@@ -51,8 +73,24 @@ class ImageViewer(QMainWindow):
         self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.scroll_area.setWidget(self.image_label)
 
+        if image_path:
+            self.set_image(image_path)
+
+    def set_image(self, image_path, image=None):
+        """切换显示的图片，窗口复用时调用
+
+        Args:
+            image_path: 图片路径
+            image: 已解码的QImage，为空时从文件读取
+        """
+        self.image_path = image_path
+        self.setWindowTitle(os.path.basename(image_path))
+
         # 加载图片
-        self.pixmap = QPixmap(image_path)
+        self.pixmap = QPixmap.fromImage(image) if image is not None else QPixmap(image_path)
+        if self.pixmap.isNull():
+            self.image_label.clear()
+            return
 
         # 计算窗口和图片的合适大小
         screen_size = QApplication.primaryScreen().size()
@@ -78,7 +116,20 @@ class ImageViewer(QMainWindow):
         # 设置窗口大小
         self.resize(display_width, display_height)
 
+    def release_image(self):
+        """释放图片占用的内存"""
+        self.image_path = None
+        self.pixmap = QPixmap()
+        self.image_label.clear()
+
+    def closeEvent(self, event):
+        # 窗口关闭后不再持有图片，下次打开时重新设置
+        self.release_image()
+        super().closeEvent(event)
+
     def wheelEvent(self, event: QWheelEvent):
+        if self.pixmap.isNull():
+            return
         # 处理鼠标滚轮事件
         if event.angleDelta().y() > 0:
             self.scale_factor *= 1.1  # 放大10%
@@ -101,31 +152,84 @@ class ImageViewer(QMainWindow):
         self.scroll_area.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
 
+class ImageViewerManager:
+    """大图查看窗口池：复用已创建的窗口切换图片，不再每次点击都新建窗口"""
+
+    def __init__(self, image_cache, max_viewers=1):
+        self.image_cache = image_cache
+        self.max_viewers = max_viewers
+        self._viewers = []
+
+    def show(self, image_path):
+        """在池中的窗口显示图片，优先复用已关闭的窗口，池满时复用最早使用的窗口"""
+        viewer = next((v for v in self._viewers if not v.isVisible()), None)
+        if viewer is None and len(self._viewers) < self.max_viewers:
+            viewer = ImageViewer()
+        elif viewer is None:
+            viewer = self._viewers[0]
+        if viewer in self._viewers:
+            self._viewers.remove(viewer)
+        self._viewers.append(viewer)
+
+        viewer.set_image(image_path, self.image_cache.image(image_path))
+        viewer.show()
+        viewer.raise_()
+        viewer.activateWindow()
+        return viewer
+
+    def close_all(self):
+        for viewer in self._viewers:
+            viewer.close()
+
+
+# 大图窗口池，两个画廊共用
+image_viewers = ImageViewerManager(image_cache)
+
+
+# 缩略图解码线程池，两个画廊共用
+thumbnail_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnail")
+# 数据库本地副本，启用时在程序入口创建
+local_replica = None
+
+
 class ImageGallery(QFrame):
+    # 加载代数, 缩略图标签, 解码后的QImage
+    thumbnail_ready = Signal(int, object, object)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.image_viewer = None
+        # 每次重新加载时加一，旧的缩略图解码结果直接丢弃
+        self._generation = 0
+        self._pending = []
+        self.thumbnail_ready.connect(self._on_thumbnail_ready)
         self.init_ui()
         
+    @staticmethod
+    def thumbnail_size(total_images):
+        """根据图片数量计算缩略图边长"""
+        # 每行最多显示4张图片
+        actual_cols = min(4, total_images)
+        return min(150, 800 // actual_cols - 20)  # 800是容器宽度，20是间距
+
     def init_ui(self):
         # 创建网格布局
         self.grid_layout = QGridLayout(self)
         self.grid_layout.setSpacing(10)
         self.grid_layout.setContentsMargins(10, 10, 10, 10)
         
+    @trace("gallery.load_images")
     def load_images(self, sku: str):
         """加载指定SKU的图纸
         
         Args:
             sku: SKU编号
         """
-        # 清除现有图片
-        for i in reversed(range(self.grid_layout.count())): 
-            self.grid_layout.itemAt(i).widget().setParent(None)
+        # 清除现有图片，取消未完成的缩略图解码
+        self.clear_images()
             
-        # 获取图纸信息
-        db_manager = DatabaseManager()
-        image_infos = db_manager.get_drawing_info_by_sku(sku)
+        # 获取图纸信息，优先使用后台预取的结果
+        image_infos = prefetch_store.take(sku, "drawings", lambda: create_database_manager().get_drawing_info_by_sku(sku))
         
         # 计算每行显示的图片数量
         max_cols = 4  # 每行最多显示4张图片
@@ -134,7 +238,7 @@ class ImageGallery(QFrame):
             # 计算每行实际显示的图片数量
             actual_cols = min(max_cols, total_images)
             # 计算缩略图大小
-            thumbnail_size = min(150, 800 // actual_cols - 20)  # 800是容器宽度，20是间距
+            thumbnail_size = self.thumbnail_size(total_images)
             
             # 显示图片
             row = 0
@@ -150,39 +254,37 @@ class ImageGallery(QFrame):
                         container_layout.setContentsMargins(0, 0, 0, 0)
                         container_layout.setSpacing(5)
                         
-                        # 创建缩略图标签
+                        # 创建缩略图标签，缩略图在后台解码
                         thumbnail_label = QLabel()
-                        pixmap = QPixmap(image_path)
-                        if not pixmap.isNull():
-                            # 设置缩略图大小
-                            thumbnail_label.setPixmap(pixmap.scaled(thumbnail_size, thumbnail_size, 
-                                                                 Qt.AspectRatioMode.KeepAspectRatio,
-                                                                 Qt.TransformationMode.SmoothTransformation))
-                            thumbnail_label.setCursor(Qt.CursorShape.PointingHandCursor)
-                            # 添加点击事件
-                            thumbnail_label.mousePressEvent = lambda e, path=image_path: self.show_full_image(path)
-                            
-                            # 创建图片名称标签
-                            name_label = QLabel()
-                            name_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                            name_label.setStyleSheet("font-size: 10px;")
-                            name_label.setText(f"{image_info['word_part']} {image_info['part_number']}")
-                            
-                            # 添加到容器布局
-                            container_layout.addWidget(thumbnail_label)
-                            container_layout.addWidget(name_label)
-                            
-                            # 添加到网格布局
-                            self.grid_layout.addWidget(container, row, col)
-                            
-                            # 更新行列位置
-                            col += 1
-                            if col >= actual_cols:
-                                col = 0
-                                row += 1
+                        thumbnail_label.setFixedSize(thumbnail_size, thumbnail_size)
+                        thumbnail_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                        self.load_thumbnail(thumbnail_label, image_path, thumbnail_size)
+                        thumbnail_label.setCursor(Qt.CursorShape.PointingHandCursor)
+                        # 添加点击事件
+                        thumbnail_label.mousePressEvent = lambda e, path=image_path: self.show_full_image(path)
+                        
+                        # 创建图片名称标签
+                        name_label = QLabel()
+                        name_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                        name_label.setStyleSheet("font-size: 10px;")
+                        name_label.setText(f"{image_info['word_part']} {image_info['part_number']}")
+                        
+                        # 添加到容器布局
+                        container_layout.addWidget(thumbnail_label)
+                        container_layout.addWidget(name_label)
+                        
+                        # 添加到网格布局
+                        self.grid_layout.addWidget(container, row, col)
+                        
+                        # 更新行列位置
+                        col += 1
+                        if col >= actual_cols:
+                            col = 0
+                            row += 1
                     except Exception as e:
                         CustomMessageBox.warning(None, "警告", f"加载图片时出错: {str(e)}")
 
+    @trace("gallery.load_real_thing_images")
     def load_real_thing_images(self, sku: str):
         print("load_real_thing_images")
         """加载指定SKU的实物图片
@@ -190,13 +292,11 @@ class ImageGallery(QFrame):
         Args:
             sku: SKU编号
         """
-        # 清除现有图片
-        for i in reversed(range(self.grid_layout.count())): 
-            self.grid_layout.itemAt(i).widget().setParent(None)
+        # 清除现有图片，取消未完成的缩略图解码
+        self.clear_images()
             
-        # 获取实物图片信息
-        db_manager = DatabaseManager()
-        image_infos = db_manager.get_part_real_images_by_sku(sku)
+        # 获取实物图片信息，优先使用后台预取的结果
+        image_infos = prefetch_store.take(sku, "real_images", lambda: create_database_manager().get_part_real_images_by_sku(sku))
         
         # 计算每行显示的图片数量
         max_cols = 4  # 每行最多显示4张图片
@@ -205,7 +305,7 @@ class ImageGallery(QFrame):
             # 计算每行实际显示的图片数量
             actual_cols = min(max_cols, total_images)
             # 计算缩略图大小
-            thumbnail_size = min(150, 800 // actual_cols - 20)  # 800是容器宽度，20是间距
+            thumbnail_size = self.thumbnail_size(total_images)
             
             # 显示图片
             row = 0
@@ -221,46 +321,69 @@ class ImageGallery(QFrame):
                         container_layout.setContentsMargins(0, 0, 0, 0)
                         container_layout.setSpacing(5)
                         
-                        # 创建缩略图标签
+                        # 创建缩略图标签，缩略图在后台解码
                         thumbnail_label = QLabel()
-                        pixmap = QPixmap(image_path)
-                        if not pixmap.isNull():
-                            # 设置缩略图大小
-                            thumbnail_label.setPixmap(pixmap.scaled(thumbnail_size, thumbnail_size, 
-                                                                 Qt.AspectRatioMode.KeepAspectRatio,
-                                                                 Qt.TransformationMode.SmoothTransformation))
-                            thumbnail_label.setCursor(Qt.CursorShape.PointingHandCursor)
-                            # 添加点击事件
-                            thumbnail_label.mousePressEvent = lambda e, path=image_path: self.show_full_image(path)
-                            
-                            # 创建图片名称标签
-                            name_label = QLabel()
-                            name_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                            name_label.setStyleSheet("font-size: 10px;")
-                            name_label.setText(f"{image_info['part_number']}")
-                            
-                            # 添加到容器布局
-                            container_layout.addWidget(thumbnail_label)
-                            container_layout.addWidget(name_label)
-                            
-                            # 添加到网格布局
-                            self.grid_layout.addWidget(container, row, col)
-                            
-                            # 更新行列位置
-                            col += 1
-                            if col >= actual_cols:
-                                col = 0
-                                row += 1
+                        thumbnail_label.setFixedSize(thumbnail_size, thumbnail_size)
+                        thumbnail_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                        self.load_thumbnail(thumbnail_label, image_path, thumbnail_size)
+                        thumbnail_label.setCursor(Qt.CursorShape.PointingHandCursor)
+                        # 添加点击事件
+                        thumbnail_label.mousePressEvent = lambda e, path=image_path: self.show_full_image(path)
+                        
+                        # 创建图片名称标签
+                        name_label = QLabel()
+                        name_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                        name_label.setStyleSheet("font-size: 10px;")
+                        name_label.setText(f"{image_info['part_number']}")
+                        
+                        # 添加到容器布局
+                        container_layout.addWidget(thumbnail_label)
+                        container_layout.addWidget(name_label)
+                        
+                        # 添加到网格布局
+                        self.grid_layout.addWidget(container, row, col)
+                        
+                        # 更新行列位置
+                        col += 1
+                        if col >= actual_cols:
+                            col = 0
+                            row += 1
                     except Exception as e:
                         CustomMessageBox.warning(None, "警告", f"加载图片时出错: {str(e)}")
                     
+    @trace("gallery.show_full_image")
     def show_full_image(self, image_path):
         """显示完整图片"""
-        self.image_viewer = ImageViewer(image_path)
-        self.image_viewer.show()
+        self.image_viewer = image_viewers.show(image_path)
     
+    def load_thumbnail(self, label, image_path, thumbnail_size):
+        """在后台解码缩略图，完成后设置到标签上"""
+        generation = self._generation
+
+        def decode():
+            # 画廊已切换到其他SKU时不再解码
+            if generation != self._generation:
+                return
+            image = image_cache.image(image_path, (thumbnail_size, thumbnail_size))
+            self.thumbnail_ready.emit(generation, label, image)
+
+        self._pending.append(thumbnail_pool.submit(decode))
+
+    def _on_thumbnail_ready(self, generation, label, image):
+        if generation != self._generation:
+            return
+        if image.isNull():
+            label.setText("无法加载")
+            return
+        label.setPixmap(QPixmap.fromImage(image))
+
     def clear_images(self):
         """清空所有图片"""
+        # 作废并取消未完成的缩略图解码
+        self._generation += 1
+        for future in self._pending:
+            future.cancel()
+        self._pending = []
         for i in reversed(range(self.grid_layout.count())): 
             widget = self.grid_layout.itemAt(i).widget()
             if widget:
@@ -276,8 +399,8 @@ class MainWindow(QMainWindow):
         # 全局变量
         self.selectedSku=""
         self.db_path = ProjectSettings.DATABASE_PATH
-        # 创建数据库管理器实例
-        self.db_manager = DatabaseManager()
+        # 创建数据库管理器实例，并跟踪每个数据库方法的耗时；写方法执行后发布数据变化事件
+        self.db_manager = change_bus.attach(perfTrace.trace_methods(create_database_manager(), "db"))
         # 引入外部窗口
         self.ui_addSku = UI_AddSkusView()
         # 连接添加SKU窗口的信号到刷新列表的方法
@@ -286,6 +409,34 @@ class MainWindow(QMainWindow):
         self.ui.skuList.item_deleted.connect(self.delete_sku_from_database)
         
         self.camera_window = None  # 初始化相机窗口变量
+        # 拍照比对引擎，相机窗口通过 parent().pic_compare 使用
+        # 图纸特征索引与主数据库放在同一目录
+        drawing_index_path = os.path.join(os.path.dirname(self.db_path), "drawing_index.db")
+        try:
+            drawing_index = DrawingIndex(drawing_index_path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"打开图纸特征索引失败，只使用内存缓存: {e}")
+            drawing_index = None
+        self.pic_compare = PicCompareEngine(index=drawing_index, parent=self)
+        # 预取接下来几个SKU的数据
+        self.sku_prefetcher = SkuPrefetcher(ImageGallery.thumbnail_size)
+        # 报告PDF导出，后台通过常驻的 LibreOffice 转换，启动时即拉起进程
+        self.pdf_converter = PdfConverter(parent=self)
+        self.pdf_converter.converted.connect(self.on_pdf_converted)
+        self.pdf_converter.failed.connect(self.on_pdf_failed)
+        # 共享目录上的文件操作在后台执行
+        self.file_ops = FileOpsService(parent=self)
+        self.file_ops.failed.connect(self.on_file_op_failed)
+        # 报告归档，EFAI_REPORT_KEEP_VERSIONS / EFAI_REPORT_KEEP_DAYS 调整清理策略（0表示不限）
+        try:
+            self.report_archive = ReportArchive(os.path.join(ProjectSettings.REPORT_PATH, "archive"),
+                                                int(os.environ.get("EFAI_REPORT_KEEP_VERSIONS", 10)),
+                                                int(os.environ.get("EFAI_REPORT_KEEP_DAYS", 0)))
+        except (OSError, sqlite3.Error) as e:
+            print(f"打开报告归档失败，不再归档报告: {e}")
+            self.report_archive = None
+        else:
+            self.file_ops.call("prune", self.report_archive.prune)
         global widgets
         widgets = self.ui
 
@@ -331,7 +482,14 @@ class MainWindow(QMainWindow):
         # 搜索输入框，就更新列表
         widgets.skuSearchLine.textChanged.connect(self.filter_list)
 
-        self.ui.skuList.itemClicked.connect(self.sku_clicked)
+        # 快速点击或方向键切换SKU时合并成一次加载，只加载最后选中的SKU
+        self.sku_select_timer = QTimer(self)
+        self.sku_select_timer.setSingleShot(True)
+        self.sku_select_timer.setInterval(150)
+        self.sku_select_timer.timeout.connect(self.commit_sku_selection)
+        self.pending_sku_item = None
+        self.ui.skuList.itemClicked.connect(self.on_sku_selected)
+        self.ui.skuList.currentItemChanged.connect(lambda current, previous: self.on_sku_selected(current))
         
         
         self.ui.btnFlow.bom_check.clicked.connect(self.btnClick_BomCheck)
@@ -414,8 +572,25 @@ class MainWindow(QMainWindow):
         self.ui.picShow.setLayout(QVBoxLayout())
         self.ui.picShow.layout().addWidget(real_thing_scroll_area)
 
+        # 隐藏的性能诊断页面，Ctrl+Shift+D 打开
+        self.perf_hud = PerfHudView()
+        widgets.stackedWidget.addWidget(self.perf_hud)
+        self.perf_hud_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.perf_hud_shortcut.activated.connect(self.showPerfHud)
+        self.perf_hud.add_metric("图片缓存", image_cache.describe)
+        if self.report_archive is not None:
+            self.perf_hud.add_metric("报告归档", self.report_archive.describe)
+        if local_replica is not None:
+            self.perf_hud.add_metric("数据库同步", local_replica.describe)
+
+        # 订阅数据变化，写入后只做局部刷新
+        change_bus.subscribe(FlowStatusChanged, self.on_flow_status_changed)
+        change_bus.subscribe(DrawingImported, self.on_drawing_imported)
+        change_bus.subscribe(SkuDeleted, self.on_sku_deleted)
+
     # ----------------------------------------左侧菜单按钮------------------------------------------------------------------
     
+    @trace("buttonClick")
     def buttonClick(self):
         # GET BUTTON CLICKED
         btn = self.sender()
@@ -439,7 +614,7 @@ class MainWindow(QMainWindow):
             widgets.stackedWidget.setCurrentWidget(widgets.SkuList)
             UIFunctions.resetStyle(self, btnName)
             btn.setStyleSheet(UIFunctions.selectMenu(btn.styleSheet()))
-            # 自动加载所有数据
+            # 每次打开都重新加载：其他工位或本地副本同步写入的报告也要显示，上次的查询条件不保留
             self.ui.reportTableView.load_data_from_db()
         
         if btnName == "btn_save":
@@ -447,6 +622,42 @@ class MainWindow(QMainWindow):
             UIFunctions.resetStyle(self, btnName)
             btn.setStyleSheet(UIFunctions.selectMenu(btn.styleSheet())) 
     
+    # ----------------------------------------数据变化处理------------------------------------------------------------------
+
+    def on_flow_status_changed(self, event):
+        """流程状态变化：只更新当前SKU对应的流程按钮"""
+        prefetch_store.discard(None, "flow_status")
+        if event.sku != self.selectedSku or event.value != '1':
+            return
+        button = getattr(self.ui.btnFlow, event.item, None)
+        if button is not None:
+            self.ui.btnFlow.add_BtnDoneStyle(button)
+
+    def on_drawing_imported(self, event):
+        """图纸表导入新数据：刷新该SKU的图纸表格和画廊，重建图纸特征索引"""
+        prefetch_store.discard(event.sku)
+        self.pic_compare.rebuild(event.sku)
+        if event.sku == self.selectedSku:
+            self.ui.tableview.load_data_from_db(event.sku)
+            self.drawing_gallery.load_images(event.sku)
+
+    def on_sku_deleted(self, event):
+        """SKU被删除：清理缓存，删除的是当前SKU时清空选择"""
+        prefetch_store.discard(event.sku)
+        self.pic_compare.invalidate(event.sku)
+        if self.pic_compare.index is not None:
+            self.pic_compare.index.remove_sku(event.sku)
+        if self.selectedSku == event.sku:
+            self.selectedSku = None
+            self.ui.btnFlow.Init_BtnStyle()
+            # 清空图片画廊
+            self.drawing_gallery.clear_images()
+            self.real_thing_gallery.clear_images()
+
+    def showPerfHud(self):
+        """显示性能诊断页面"""
+        widgets.stackedWidget.setCurrentWidget(self.perf_hud)
+
     # ----------------------------------------首页图表方法------------------------------------------------------------------
         """创建折线图"""    
     def create_line_chart(self):
@@ -813,6 +1024,7 @@ class MainWindow(QMainWindow):
         # 加载列表
 
         self.ui.tableview.load_data_from_db(self.selectedSku)
+    @trace("camera.open")
     def btnClick_PicCheck(self):
 
         try:               
@@ -820,6 +1032,9 @@ class MainWindow(QMainWindow):
                 return
             
             from modules.OtherView.TakePicView import TakePicWindow
+
+            # 后台预先计算图纸特征，拍照后可以立即比对
+            self.pic_compare.prepare(self.selectedSku)
             
             # 确保camera_window被正确初始化
             if not hasattr(self, 'camera_window'):
@@ -859,6 +1074,7 @@ class MainWindow(QMainWindow):
             CustomMessageBox.warning(None, "错误", f"打开相机窗口失败：{str(e)}")
             self.camera_window = None
     
+    @trace("btnClick_GenReport")
     def btnClick_GenReport(self):
         if not self.check_status('pic_check','请先完成拍照比对流程！'):
             return
@@ -888,8 +1104,8 @@ class MainWindow(QMainWindow):
         if reply == CustomMessageBox.StandardButton.Yes:
             # 更新流程状态
             self.db_manager.update_flow_status(self.selectedSku, 'pic_download', '1')
-            # 更新按钮样式
-            self.ui.btnFlow.add_BtnDoneStyle(self.ui.btnFlow.pic_download)
+            # 图纸下载完成，后台建立图纸特征索引
+            self.pic_compare.rebuild(self.selectedSku)
             # 返回主流程页面
             widgets.stackedWidget.setCurrentWidget(widgets.flow_check)
             
@@ -909,9 +1125,6 @@ class MainWindow(QMainWindow):
                 return
             # 更新流程状态
             self.db_manager.update_flow_status(self.selectedSku, 'bom_check', '1')
-
-            # 更新按钮样式
-            self.ui.btnFlow.add_BtnDoneStyle(self.ui.btnFlow.bom_check)
             # 返回主流程页面
             widgets.stackedWidget.setCurrentWidget(widgets.flow_check)
             
@@ -932,9 +1145,6 @@ class MainWindow(QMainWindow):
             product = self.ui.Producttext.toPlainText().strip()
             language = self.ui.Languagetext.toPlainText().strip()
             
-            print(f"DEBUG: 从文本框获取的产品名: '{product}'")  # 调试输出
-            print(f"DEBUG: 从文本框获取的语言: '{language}'")  # 调试输出
-            
             # 检查产品名是否为空
             if not product:
                 CustomMessageBox.warning(None, "警告", "请输入产品名！")
@@ -947,19 +1157,18 @@ class MainWindow(QMainWindow):
 
             # 获取BOM文件路径
             sku_dir = os.path.join(ProjectSettings.BOM_CHECK_PATH, self.selectedSku)
-            print(f"DEBUG: BOM文件路径: {sku_dir}")
             if not os.path.exists(sku_dir):
                 CustomMessageBox.warning(None, "警告", f"当前还未使用RPA下载BOM")
                 return False
                 
-            # 获取各种BOM文件
-            print(f"DEBUG: 当前SKU: {self.selectedSku}")
-            ckm1_bom_path = [file for file in os.listdir(sku_dir) if file.startswith(f"{self.selectedSku} CKM1 BOM")]
-            msft_bom_path = [file for file in os.listdir(sku_dir) if file.startswith(f"{self.selectedSku} MSFT BOM")]
-            fai_observations_path = [file for file in os.listdir(sku_dir) if file.startswith(f"{self.selectedSku} MSFT BOM & CKM1 BOM Comparison result") and file.endswith(".xlsx")]
-            print(f"DEBUG: 找到的CKM1 BOM文件: {ckm1_bom_path}")
-            print(f"DEBUG: 找到的MSFT BOM文件: {msft_bom_path}")
-            print(f"DEBUG: 找到的FAI观察文件: {fai_observations_path}")
+            # 获取各种BOM文件，读取到的信息记录在跟踪日志里
+            with trace("bom.read_paths", sku=self.selectedSku, product=product, language=language,
+                       sku_dir=sku_dir) as span:
+                files = os.listdir(sku_dir)
+                ckm1_bom_path = [file for file in files if file.startswith(f"{self.selectedSku} CKM1 BOM")]
+                msft_bom_path = [file for file in files if file.startswith(f"{self.selectedSku} MSFT BOM")]
+                fai_observations_path = [file for file in files if file.startswith(f"{self.selectedSku} MSFT BOM & CKM1 BOM Comparison result") and file.endswith(".xlsx")]
+                span.attrs.update(ckm1_bom=ckm1_bom_path, msft_bom=msft_bom_path, fai_observations=fai_observations_path)
             # 检查是否找到必要的文件
             if not ckm1_bom_path or not msft_bom_path:
                 CustomMessageBox.warning(None, "警告", "未找到必要的BOM文件")
@@ -1007,6 +1216,7 @@ class MainWindow(QMainWindow):
         if self.ui.skuList.count() > 0:
             self.sku_clicked(self.ui.skuList.item(0) )
 
+    @trace("filter_list")
     def filter_list(self):
         # 清空 QListWidget
         self.ui.skuList.clear()
@@ -1021,11 +1231,39 @@ class MainWindow(QMainWindow):
                 if not self.ui.skuList.findItems(item, Qt.MatchExactly):
                     self.ui.skuList.add_Item_sku(item)
 
+    def on_sku_selected(self, item):
+        """SKU选择变化，延迟加载，期间再次变化时重新计时"""
+        if item is None:
+            return
+        # 立即记录选中的SKU，流程按钮总是作用在当前选中的SKU上
+        self.selectedSku = item.text()
+        self.pending_sku_item = item
+        # 取消上一个SKU未完成的加载
+        self.sku_prefetcher.cancel()
+        self.drawing_gallery.clear_images()
+        self.real_thing_gallery.clear_images()
+        self.sku_select_timer.start()
+
+    def commit_sku_selection(self):
+        """选择稳定后加载最终选中的SKU"""
+        item, self.pending_sku_item = self.pending_sku_item, None
+        try:
+            if item is None or item.listWidget() is None:
+                return
+        except RuntimeError:
+            # 列表已刷新，选中的条目已被删除
+            return
+        self.sku_clicked(item)
+
+    @trace("sku_clicked")
     def sku_clicked(self, item):
+        # 直接加载时取消还在等待的合并加载
+        self.sku_select_timer.stop()
+        self.pending_sku_item = None
         self.ui.btnFlow.Init_BtnStyle()
         self.selectedSku=item.text()
         key = item.text()
-        flow_status = self.db_manager.select_skuDic_list()
+        flow_status = prefetch_store.take(None, "flow_status", self.db_manager.select_skuDic_list)
         for statusDict in flow_status:
             value = statusDict.get(key)
             if value:
@@ -1043,23 +1281,25 @@ class MainWindow(QMainWindow):
         self.drawing_gallery.load_images(self.selectedSku)
         # 加载实物图片到实物图片画廊
         self.real_thing_gallery.load_real_thing_images(self.selectedSku)
+        # 后台预取列表中接下来几个SKU的数据
+        self.prefetch_next_skus(item)
         # 加载BOM文件列表
     
+    def prefetch_next_skus(self, item, count=3):
+        """后台预取列表中当前SKU之后的几个SKU"""
+        row = self.ui.skuList.row(item)
+        skus = []
+        for next_row in range(row + 1, min(row + 1 + count, self.ui.skuList.count())):
+            skus.append(self.ui.skuList.item(next_row).text())
+        self.sku_prefetcher.schedule(skus)
+
     def delete_sku_from_database(self, sku_text):
         """从数据库中删除SKU"""
         try:
-            # 从数据库中删除SKU
+            # 从数据库中删除SKU，选中状态和缓存由 on_sku_deleted 清理
             self.db_manager.delete_sku(sku_text)
             print(f"已从数据库中删除SKU: {sku_text}")
             
-            # 如果删除的是当前选中的SKU，清空选择
-            if hasattr(self, 'selectedSku') and self.selectedSku == sku_text:
-                self.selectedSku = None
-                self.ui.btnFlow.Init_BtnStyle()
-                # 清空图片画廊
-                self.drawing_gallery.clear_images()
-                self.real_thing_gallery.clear_images()
-            
             # 显示删除成功消息
             CustomMessageBox.info(None, "删除成功", f"已成功删除SKU: {sku_text}")
             
@@ -1176,6 +1416,7 @@ class MainWindow(QMainWindow):
 
     # -----------------------------------------图纸上传页面方法------------------------------------------------------------------
     
+    @trace("uploadCheckFile")
     def uploadCheckFile(self):
         try:
             # 检查是否已选择SKU
@@ -1184,6 +1425,7 @@ class MainWindow(QMainWindow):
                 return
                 
             # 检查SKU是否已存在于drawing表中
+            reupload = False
             if self.db_manager.check_sku_exists_in_drawing(self.selectedSku):
                 reply = CustomMessageBox.question(
                     None,
@@ -1194,21 +1436,7 @@ class MainWindow(QMainWindow):
                 )
                 if reply == CustomMessageBox.StandardButton.No:
                     return
-                if reply == CustomMessageBox.StandardButton.Yes:
-                    # 数据库清除数据
-                    self.db_manager.delete_data_by_sku(self.selectedSku)
-                    self.db_manager.delete_pic_by_sku(self.selectedSku)
-                    # 删除物料文件
-                    BOM_BASE_PATH = os.path.join(ProjectSettings.BOM_CHECK_PATH, self.selectedSku)
-                    BOM_DIR = os.path.join(BOM_BASE_PATH,self.selectedSku+"物料.xlsx")
-                    os.remove(BOM_DIR)
-                    # 删除文件夹
-                    SCREENSHOT_DIR = os.path.join(ProjectSettings.REALPIC_PATH, self.selectedSku, "SCREENSHOT")
-                    self.delete_folder(SCREENSHOT_DIR)
-                     # 加载列表
-                    self.ui.tableview.load_data_from_db(self.selectedSku)
-                    # 加载图片画廊
-                    self.image_gallery.load_images(self.selectedSku)
+                reupload = True
 
             # 打开文件选择对话框
             file_path, _ = QFileDialog.getOpenFileName(
@@ -1218,22 +1446,34 @@ class MainWindow(QMainWindow):
                 "Excel文件 (*.xlsx *.xls)"
             )
 
-            if not file_path:  # 用户取消选择
+            if not file_path:  # 用户取消选择，原有数据和文件保持不变
                 return
 
-
-            # 导入Excel数据到数据库
-            if self.db_manager.import_excel_to_drawing(self.db_path, self.selectedSku, file_path):
+            # 导入Excel数据到数据库；重新上传时先删除原有数据，导入失败则恢复原有数据
+            if reupload and isinstance(self.db_manager, RemoteDatabaseManager):
+                imported = self.db_manager.reimport_drawing(self.db_path, self.selectedSku, file_path)
+            elif reupload:
+                imported = reimport_drawing(self.db_manager, self.db_path, self.selectedSku, file_path)
+            else:
+                imported = self.db_manager.import_excel_to_drawing(self.db_path, self.selectedSku, file_path)
+            if imported:
                 
+                # 表格、画廊和图纸特征索引由 on_drawing_imported 刷新
                 CustomMessageBox.info(None, "成功", "数据已成功导入数据库")
-                #将文件file_path复制到BOM_BASE_PATH
+                # 后台用新的物料文件替换旧文件，复制完成前旧文件保持不动
                 BOM_BASE_PATH = os.path.join(ProjectSettings.BOM_CHECK_PATH, self.selectedSku)
                 BOM_DIR = os.path.join(BOM_BASE_PATH,self.selectedSku+"物料.xlsx")
-                shutil.copy(file_path, BOM_DIR)
-                # 刷新表格显示
-                self.ui.tableview.load_data_from_db(self.selectedSku)
+                self.file_ops.replace_file(file_path, BOM_DIR)
+                if reupload:
+                    # 后台删除原有的截图文件夹
+                    SCREENSHOT_DIR = os.path.join(ProjectSettings.REALPIC_PATH, self.selectedSku, "SCREENSHOT")
+                    self.file_ops.delete(SCREENSHOT_DIR)
+                    prefetch_store.discard(self.selectedSku, "real_images")
+                    self.real_thing_gallery.load_real_thing_images(self.selectedSku)
             else:
-                CustomMessageBox.warning(None, "错误", "导入数据失败")
+                CustomMessageBox.warning(None, "错误", "导入数据失败，原有数据保持不变")
+                if reupload:
+                    self.ui.tableview.load_data_from_db(self.selectedSku)
 
         except Exception as e:
             CustomMessageBox.warning(None, "错误", f"导入数据时出错: {str(e)}")
@@ -1309,6 +1549,7 @@ class MainWindow(QMainWindow):
         """当机种改变时更新标签"""
         self.ui.model_label.setText(model_name)
 
+    @trace("report.generate")
     def generate_report(self):
         # 检查是否选择了SKU
         if not self.selectedSku:
@@ -1343,7 +1584,8 @@ class MainWindow(QMainWindow):
         output_path = ProjectSettings.REPORT_PATH + self.selectedSku + ".docx"  
 
         try:
-            generate_report_with_images(self.selectedSku, template_path, output_path, self.db_manager)
+            with trace("report.images", sku=self.selectedSku):
+                generate_report_with_images(self.selectedSku, template_path, output_path, self.db_manager)
              # 打开模板文档
             doc = Document(output_path)
             
@@ -1380,14 +1622,29 @@ class MainWindow(QMainWindow):
                             if "{{reference_info}}" in paragraph.text:
                                 paragraph.text = paragraph.text.replace("{{reference_info}}", reference_info)
             # 保存文档
-            doc.save(output_path)  
+            with trace("report.save", sku=self.selectedSku):
+                doc.save(output_path)  
             # 更改数据库状态
             self.db_manager.update_flow_status(self.selectedSku, 'gen_report', '1')
                 # 更新所有完成按钮状态
             self.db_manager.update_flow_status(self.selectedSku, 'Status', '1')
                 # 更新报告状态
             self.db_manager.insert_report_path(self.selectedSku, reference_info,sn,faiDate,output_path, self.selectedSku+".docx")
-            self.sku_clicked(self.ui.skuList.item(0) )
+            # 后台归档本次报告和输入清单
+            if self.report_archive is not None:
+                manifest = {
+                    "model_name": model_name,
+                    "product_name": product_name,
+                    "sn": sn,
+                    "country": country,
+                    "fai_date": faiDate,
+                    "reference_info": reference_info,
+                    "template_path": template_path,
+                    "template_mtime": os.path.getmtime(template_path),
+                }
+                self.file_ops.call("archive", self.archive_report, self.selectedSku, output_path, manifest)
+            # 后台导出PDF
+            self.pdf_converter.submit(output_path)
             CustomMessageBox.information(None, "成功", f"报告已生成：{output_path}")
             os.startfile(output_path)
                 
@@ -1395,6 +1652,23 @@ class MainWindow(QMainWindow):
             CustomMessageBox.error(None, "错误", f"生成报告失败: {str(e)}")
         
 
+    def on_pdf_converted(self, docx_path, pdf_path):
+        """PDF导出完成"""
+        print(f"PDF已导出: {pdf_path}")
+
+    def on_pdf_failed(self, docx_path, error):
+        """PDF导出失败"""
+        print(f"导出PDF失败 {docx_path}: {error}")
+
+    def archive_report(self, sku, report_path, manifest):
+        """归档报告并按策略清理该SKU的旧版本（在文件操作线程中执行）"""
+        self.report_archive.archive(sku, report_path, manifest)
+        self.report_archive.prune(sku)
+
+    def on_file_op_failed(self, task_id, error):
+        """后台文件操作失败"""
+        CustomMessageBox.warning(None, "错误", f"文件操作失败: {error}")
+
     def update_sn_label(self):
         """更新SN标签内容"""
         sn_text = self.ui.SN_textEdit.toPlainText()
@@ -1408,7 +1682,8 @@ class MainWindow(QMainWindow):
                 return
                 
             # 获取数据库的值
-            references = self.db_manager.get_references_by_sku(self.selectedSku)
+            sku = self.selectedSku
+            references = prefetch_store.take(sku, "references", lambda: self.db_manager.get_references_by_sku(sku))
             
             # 将references_textEdit的值设置为获取到的reference_info
             if references:
@@ -1512,6 +1787,25 @@ class MainWindow(QMainWindow):
             if hasattr(self, 'camera_window') and self.camera_window is not None:
                 self.camera_window.close()
                 self.camera_window = None
+            # 关闭大图窗口
+            image_viewers.close_all()
+            # 关闭拍照比对线程池
+            self.pic_compare.shutdown()
+            # 停止预取
+            self.sku_prefetcher.shutdown()
+            # 停止缩略图解码
+            thumbnail_pool.shutdown(wait=False, cancel_futures=True)
+            # 停止PDF导出线程
+            self.pdf_converter.shutdown()
+            # 等待进行中的文件操作完成
+            self.file_ops.shutdown()
+            # 关闭跟踪日志
+            perfTrace.shutdown()
+            # 推送剩余的本地变更
+            if local_replica is not None:
+                local_replica.shutdown()
+            # 输出SQL统计报告
+            sqlProfiler.write_report()
             # 退出应用程序
             QApplication.instance().quit()
         else:
@@ -1521,7 +1815,38 @@ class MainWindow(QMainWindow):
            
 
 if __name__ == "__main__":
+    # 日志写到程序目录下的logs，程序目录只读时改用当前用户的日志目录，都不可写时不写日志文件
+    appDir = os.path.dirname(os.path.abspath(sys.executable if getattr(sys, 'frozen', False) else __file__))
+    logDir = perfTrace.resolve_log_dir(os.path.join(appDir, "logs"))
+    # 设置 EFAI_TRACE=0 时关闭性能跟踪，设置 EFAI_TRACE_CHROME=1 时同时输出Chrome trace
+    if os.environ.get("EFAI_TRACE") == "0":
+        perfTrace.set_enabled(False)
+    elif logDir:
+        perfTrace.configure(logDir, chrome=os.environ.get("EFAI_TRACE_CHROME") == "1")
+    # 设置 EFAI_SQL_PROFILE=1 时记录每条SQL的耗时，并输出慢查询日志
+    if os.environ.get("EFAI_SQL_PROFILE") == "1" and logDir:
+        sqlProfiler.install(logDir, float(os.environ.get("EFAI_SLOW_QUERY_MS", sqlProfiler.SLOW_QUERY_MS)))
+    # 设置 EFAI_LOCAL_REPLICA=1 时界面读写本地副本，后台与共享目录上的数据库同步（使用数据库服务时不启用）
+    # 副本放在当前用户的数据目录，准备失败时直接使用共享目录上的数据库
+    if os.environ.get("EFAI_LOCAL_REPLICA") == "1" and not os.environ.get(DB_SERVICE_ENV):
+        try:
+            local_replica = LocalReplica(ProjectSettings.DATABASE_PATH,
+                                         perfTrace.user_data_dir("replica", os.path.basename(ProjectSettings.DATABASE_PATH)),
+                                         logDir or perfTrace.user_log_dir(), float(os.environ.get("EFAI_SYNC_SECONDS", 30)))
+            replica_path = local_replica.prepare()
+            local_replica.start()
+            ProjectSettings.DATABASE_PATH = replica_path
+        except (OSError, sqlite3.Error) as e:
+            print(f"准备本地数据库副本失败，直接使用 {ProjectSettings.DATABASE_PATH}: {e}")
+            local_replica = None
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon("icon.ico"))
     window = MainWindow()
+    # 界面线程卡顿监测，卡顿超过阈值时把调用栈写到 logs/stall.log
+    watchdog = StallWatchdog(logDir, threshold=float(os.environ.get("EFAI_STALL_SECONDS", 1.0)))
+    watchdog.start()
+    # 设置 EFAI_MEM_PROFILE=1 时定时记录内存和Qt对象数量的增长，写到 logs/memory.log
+    if os.environ.get("EFAI_MEM_PROFILE") == "1" and logDir:
+        memory_profiler = MemoryProfiler(logDir, float(os.environ.get("EFAI_MEM_PROFILE_MINUTES", 5)))
+        memory_profiler.start()
     sys.exit(app.exec())
@@ -5,7 +5,8 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    # LibreOffice 自带的 Python 以脚本方式运行，需要保留源文件
+    datas=[('modules/Script/unoConvert.py', 'modules/Script')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,136 @@
+import time
+
+from PySide6.QtCore import Qt, QElapsedTimer, QTimer
+from PySide6.QtWidgets import (QFormLayout, QHeaderView, QLabel, QTableWidget,
+                               QTableWidgetItem, QVBoxLayout, QWidget)
+
+from modules.Script import perfTrace, sqlProfiler
+from modules.Script.memProfile import process_memory_mb
+
+
+class EventLoopLagMonitor:
+    """事件循环延迟监测：定时器实际触发间隔与预期间隔之差"""
+
+    def __init__(self, interval_ms: int = 100, parent=None):
+        self.interval_ms = interval_ms
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._elapsed = QElapsedTimer()
+        self._timer = QTimer(parent)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        self._elapsed.start()
+        self._timer.start()
+
+    def _tick(self):
+        lag = max(0.0, self._elapsed.restart() - self.interval_ms)
+        self.last_lag_ms = lag
+        self.max_lag_ms = max(self.max_lag_ms, lag)
+
+    def take_max(self):
+        """返回上次读取以来的最大延迟并清零"""
+        value, self.max_lag_ms = self.max_lag_ms, 0.0
+        return value
+
+
+class PerfHudView(QWidget):
+    """性能诊断页面：显示事件循环延迟、最近操作耗时、缓存命中率、数据库查询次数和内存
+
+    只在页面可见时刷新显示，后台只保留一个低频的事件循环延迟定时器。
+    """
+
+    RECENT_ACTIONS = 20
+    # 嵌套在其他操作里也单独显示的跨度名称前缀（图库加载、报告生成的各个阶段）
+    NESTED_ACTIONS = ("gallery.", "report.")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setObjectName("perf_hud")
+        # 额外指标：名称 -> 返回显示文本的函数
+        self._metrics = {}
+        self._db_calls = 0
+        perfTrace.add_listener(self._on_span)
+
+        self.lag_monitor = EventLoopLagMonitor(parent=self)
+        self.lag_monitor.start()
+
+        layout = QVBoxLayout(self)
+        title = QLabel("性能诊断")
+        title.setStyleSheet("font-size: 16px; font-weight: bold;")
+        layout.addWidget(title)
+
+        self.form = QFormLayout()
+        self.lag_label = QLabel()
+        self.memory_label = QLabel()
+        self.db_label = QLabel()
+        self.form.addRow("事件循环延迟", self.lag_label)
+        self.form.addRow("进程内存", self.memory_label)
+        self.form.addRow("数据库查询次数", self.db_label)
+        layout.addLayout(self.form)
+        self._metric_labels = {}
+
+        self.action_table = QTableWidget(0, 3)
+        self.action_table.setHorizontalHeaderLabels(["时间", "操作", "耗时(ms)"])
+        self.action_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.action_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.action_table)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def add_metric(self, name: str, provider):
+        """注册额外指标，provider 返回要显示的文本"""
+        self._metrics[name] = provider
+        label = QLabel()
+        self._metric_labels[name] = label
+        self.form.addRow(name, label)
+
+    def _on_span(self, record):
+        # 可能在工作线程中调用，只做计数
+        if record["name"].startswith("db."):
+            self._db_calls += 1
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        self.lag_label.setText(f"{self.lag_monitor.take_max():.0f} ms（近1秒最大值）")
+
+        memory = process_memory_mb()
+        self.memory_label.setText(f"{memory:.1f} MB" if memory is not None else "未知")
+
+        if sqlProfiler.installed():
+            self.db_label.setText(f"{sqlProfiler.total_queries()} 条SQL / {self._db_calls} 次方法调用")
+        else:
+            self.db_label.setText(f"{self._db_calls} 次方法调用")
+
+        for name, provider in self._metrics.items():
+            try:
+                self._metric_labels[name].setText(str(provider()))
+            except Exception as e:
+                self._metric_labels[name].setText(f"错误: {e}")
+
+        # 显示界面线程中的顶层操作，以及嵌套在其中、名称在 NESTED_ACTIONS 中的阶段；
+        # 嵌套的跨度先于外层完成，倒序显示时正好排在外层操作下方，缩进显示
+        actions = [record for record in list(perfTrace.recent_spans)
+                   if record["thread"] == "MainThread"
+                   and ("parent" not in record or record["name"].startswith(self.NESTED_ACTIONS))][-self.RECENT_ACTIONS:]
+        self.action_table.setRowCount(len(actions))
+        for row, record in enumerate(reversed(actions)):
+            name = record["name"] if "parent" not in record else f"    {record['name']}"
+            values = [time.strftime("%H:%M:%S", time.localtime(record["ts"])),
+                      name, f"{record['duration_ms']:.1f}"]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column == 2:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.action_table.setItem(row, column, item)
@@ -0,0 +1,149 @@
+import functools
+import inspect
+from dataclasses import dataclass
+
+from PySide6.QtCore import QObject, Signal
+
+
+@dataclass
+class FlowStatusChanged:
+    """流程状态变化"""
+    sku: str
+    item: str
+    value: str
+
+
+@dataclass
+class ReportRecorded:
+    """生成了新的报告记录"""
+    sku: str
+    report_path: str
+
+
+@dataclass
+class DrawingImported:
+    """图纸表导入了新的数据"""
+    sku: str
+
+
+@dataclass
+class BomPathUpdated:
+    """BOM路径信息更新"""
+    sku: str
+
+
+@dataclass
+class SkuDeleted:
+    """SKU被删除"""
+    sku: str
+
+
+class ChangeBus(QObject):
+    """数据变化通知总线
+
+    数据库管理器的写方法执行成功后发布对应的变化事件，界面按事件类型订阅，
+    只做有针对性的局部刷新，不再每次写入后整页重新加载。
+    在工作线程中发布的事件会排队到订阅者所在线程处理。
+    """
+
+    changed = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # 事件类型 -> 回调列表
+        self._subscribers = {}
+        self.changed.connect(self._dispatch)
+
+    def subscribe(self, event_type, callback):
+        self._subscribers.setdefault(event_type, []).append(callback)
+
+    def unsubscribe(self, event_type, callback):
+        callbacks = self._subscribers.get(event_type, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def publish(self, event):
+        self.changed.emit(event)
+
+    def _dispatch(self, event):
+        for callback in list(self._subscribers.get(type(event), [])):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"处理数据变化事件 {type(event).__name__} 时出错: {e}")
+
+    def attach(self, db_manager):
+        """包装数据库管理器实例的写方法，执行成功（返回值不为False）后发布事件
+
+        事件构造函数按方法的参数顺序接收位置参数；调用时用关键字传入的参数
+        先按方法签名整理回原来的位置，签名中没有对应位置的关键字参数按名称传入。
+        """
+        events = {
+            "update_flow_status": lambda sku, item, value, *rest, **others: FlowStatusChanged(sku, item, value),
+            "insert_report_path": lambda sku, reference_info, sn, fai_date, output_path, *rest, **others:
+                ReportRecorded(sku, output_path),
+            "import_excel_to_drawing": lambda db_path, sku, *rest, **others: DrawingImported(sku),
+            # 只有数据库服务客户端有这个方法，本地数据库管理器由 import_excel_to_drawing 发布
+            "reimport_drawing": lambda db_path, sku, *rest, **others: DrawingImported(sku),
+            "Insert_BOM_Path": lambda sku, *rest, **others: BomPathUpdated(sku),
+            "delete_sku": lambda sku, *rest, **others: SkuDeleted(sku),
+        }
+        for method_name, make_event in events.items():
+            method = getattr(db_manager, method_name, None)
+            if method is not None:
+                setattr(db_manager, method_name, self._publishing(method, make_event))
+        return db_manager
+
+    @staticmethod
+    def _ordered_args(signature, args, kwargs):
+        """按方法签名把调用参数整理为 (位置参数, 关键字参数)，默认值一并补上
+
+        签名无法获取或绑定时原样返回。
+        """
+        if signature is None:
+            return args, kwargs
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError:
+            return args, kwargs
+        bound.apply_defaults()
+        positional = []
+        keywords = {}
+        for name, param in signature.parameters.items():
+            if name not in bound.arguments:
+                continue
+            value = bound.arguments[name]
+            if param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+                positional.append(value)
+            elif param.kind == param.VAR_POSITIONAL:
+                positional.extend(value)
+            elif param.kind == param.VAR_KEYWORD:
+                keywords.update(value)
+            else:
+                keywords[name] = value
+        return positional, keywords
+
+    def _publishing(self, method, make_event):
+        try:
+            signature = inspect.signature(method)
+        except (TypeError, ValueError):
+            signature = None
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            result = method(*args, **kwargs)
+            if result is not False:
+                positional, keywords = self._ordered_args(signature, args, kwargs)
+                try:
+                    event = make_event(*positional, **keywords)
+                except TypeError as e:
+                    # 写入已经成功，构造事件失败只记录，不影响调用方
+                    print(f"无法为 {getattr(method, '__name__', method)} 构造数据变化事件: {e}")
+                else:
+                    self.publish(event)
+            return result
+        return wrapper
+
+
+# 全局数据变化总线
+change_bus = ChangeBus()
@@ -0,0 +1,299 @@
+import argparse
+import base64
+import functools
+import hmac
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from modules.Script.perfTrace import Span
+from modules.Script.skuReimport import reimport_drawing
+
+
+# 设置后各工位通过数据库服务访问数据库，例如 http://192.168.1.10:8765
+DB_SERVICE_ENV = "EFAI_DB_SERVICE"
+# 服务端和各工位共用的访问令牌
+DB_SERVICE_TOKEN_ENV = "EFAI_DB_SERVICE_TOKEN"
+TOKEN_HEADER = "X-EFAI-Token"
+# 只读方法的前缀，结果可以缓存，失败可以重试，其他方法视为写操作
+READ_PREFIXES = ("select_", "get_", "check_", "load_")
+# 允许通过服务调用的数据库方法（程序实际用到的方法）
+ALLOWED_METHODS = {
+    "Insert_BOM_Path", "check_sku_exists_in_drawing", "check_template", "check_status",
+    "delete_data_by_sku", "delete_pic_by_sku", "delete_sku",
+    "get_countryCount", "get_drawing_info_by_sku", "get_part_real_images_by_sku",
+    "get_product_name_country", "get_references_by_sku", "get_template_path",
+    "import_excel_to_drawing", "insert_report_path", "load_model_data",
+    "select_skuDic_list", "select_sku_list", "update_flow_status",
+    "reimport_drawing",
+}
+# 由服务端组合多个数据库方法完成的操作：方法名 -> 函数(数据库管理器, *参数)
+SERVICE_METHODS = {"reimport_drawing": reimport_drawing}
+# 参数是工位本地文件的方法：方法名 -> 文件参数的位置，文件内容随请求上传
+FILE_ARGS = {"import_excel_to_drawing": (2,), "reimport_drawing": (2,)}
+# 参数是数据库路径的方法：方法名 -> 参数位置，服务端改用自己的数据库路径
+DB_PATH_ARGS = {"import_excel_to_drawing": 0, "reimport_drawing": 0}
+# 客户端连接空闲超过这个秒数后，写操作前重新连接，避免用到已断开的长连接
+IDLE_RECONNECT_SECONDS = 30
+
+
+class DatabaseServiceError(Exception):
+    """数据库服务调用失败"""
+
+
+def is_read_method(method_name: str) -> bool:
+    return method_name.startswith(READ_PREFIXES)
+
+
+def _is_loopback(host: str) -> bool:
+    return host in ("127.0.0.1", "localhost", "::1")
+
+
+class DatabaseService:
+    """数据库服务端：在一台机器上集中访问SQLite，其他工位通过HTTP/JSON调用
+
+    每个客户端长连接由一个服务线程处理，线程内复用同一个数据库管理器（连接）。
+    只读方法的结果按参数缓存：写操作完成后在写锁内递增缓存代数，读取开始后
+    代数变化的结果不写入缓存；其他程序仍可能直接写数据库文件，缓存同时按数据库
+    文件（含WAL文件）的修改时间和 cache_ttl 秒失效。
+    """
+
+    def __init__(self, db_path: str = None, max_cache_entries: int = 1000, cache_ttl: float = 5.0):
+        if db_path is None:
+            from modules import ProjectSettings
+            db_path = ProjectSettings.DATABASE_PATH
+        self.db_path = db_path
+        self.max_cache_entries = max_cache_entries
+        self.cache_ttl = cache_ttl
+        self._local = threading.local()
+        # key -> (代数, 数据库文件状态, 时间, 结果)
+        self._cache = {}
+        self._generation = 0
+        self._cache_lock = threading.Lock()
+        # 写操作串行执行，避免SQLite写锁竞争
+        self._write_lock = threading.Lock()
+
+    def _db_stamp(self):
+        """数据库文件和WAL文件的 (修改时间, 大小)，其他程序写入后会变化"""
+        stamp = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                stat = os.stat(path)
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def call(self, method_name: str, args, kwargs, files=None):
+        if method_name not in ALLOWED_METHODS:
+            raise DatabaseServiceError(f"不允许调用方法: {method_name}")
+        if method_name in SERVICE_METHODS:
+            method = functools.partial(SERVICE_METHODS[method_name], self._db_manager())
+        else:
+            method = getattr(self._db_manager(), method_name, None)
+        if method is None:
+            raise DatabaseServiceError(f"数据库管理器没有方法: {method_name}")
+        args = list(args)
+        if method_name in DB_PATH_ARGS and len(args) > DB_PATH_ARGS[method_name]:
+            args[DB_PATH_ARGS[method_name]] = self.db_path
+
+        if not is_read_method(method_name):
+            with self._write_lock:
+                with self._uploaded_files(method_name, args, files or {}):
+                    result = method(*args, **kwargs)
+                with self._cache_lock:
+                    self._generation += 1
+                    self._cache.clear()
+            return result
+
+        key = json.dumps([method_name, args, kwargs], sort_keys=True, default=str)
+        stamp = self._db_stamp()
+        with self._cache_lock:
+            generation = self._generation
+            entry = self._cache.get(key)
+            if (entry is not None and entry[0] == generation and entry[1] == stamp
+                    and time.monotonic() - entry[2] <= self.cache_ttl):
+                return entry[3]
+        result = method(*args, **kwargs)
+        with self._cache_lock:
+            # 读取期间有写操作完成，结果可能是写之前的数据，不缓存
+            if generation == self._generation and stamp == self._db_stamp():
+                if len(self._cache) >= self.max_cache_entries:
+                    self._cache.clear()
+                self._cache[key] = (generation, stamp, time.monotonic(), result)
+        return result
+
+    @staticmethod
+    @contextmanager
+    def _uploaded_files(method_name: str, args, files):
+        """把请求中上传的文件写到临时目录，替换对应的路径参数，调用结束后删除"""
+        temp_dir = None
+        try:
+            for index in FILE_ARGS.get(method_name, ()):
+                upload = files.get(str(index))
+                if upload is None:
+                    continue
+                if temp_dir is None:
+                    temp_dir = tempfile.mkdtemp(prefix="efai_upload_")
+                path = os.path.join(temp_dir, os.path.basename(upload["name"]))
+                with open(path, "wb") as f:
+                    f.write(base64.b64decode(upload["data"]))
+                args[index] = path
+            yield
+        finally:
+            if temp_dir is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _db_manager(self):
+        """当前服务线程的数据库管理器"""
+        db_manager = getattr(self._local, "db_manager", None)
+        if db_manager is None:
+            from modules import DatabaseManager
+            db_manager = self._local.db_manager = DatabaseManager()
+        return db_manager
+
+    def serve(self, host: str, port: int, token: str = None):
+        if not token and not _is_loopback(host):
+            raise DatabaseServiceError(f"监听 {host} 时必须设置访问令牌（--token 或 {DB_SERVICE_TOKEN_ENV}）")
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = self.rfile.read(length)
+                if token and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), token):
+                    self._reply(403, {"error": "访问令牌无效"})
+                    return
+                try:
+                    request = json.loads(payload)
+                    result = service.call(request["method"], request.get("args", []),
+                                          request.get("kwargs", {}), request.get("files"))
+                    body = {"result": result}
+                except Exception as e:
+                    body = {"error": f"{type(e).__name__}: {e}"}
+                self._reply(200, body)
+
+            def _reply(self, status, body):
+                data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        print(f"数据库服务已启动: http://{host}:{port}")
+        server.serve_forever()
+
+
+class RemoteDatabaseManager:
+    """数据库服务客户端，接口与数据库管理器相同，方法调用转发到数据库服务
+
+    每个线程保持一个长连接。只读方法失败时重连重试一次；写方法只在请求还没
+    发出去时重试，已发出的写请求失败直接报错，避免服务端执行两次。
+    工位本地文件参数（如导入的Excel）的内容随请求上传。
+    """
+
+    def __init__(self, url: str, token: str = None, timeout: float = 30):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.token = token if token is not None else os.environ.get(DB_SERVICE_TOKEN_ENV, "")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self, fresh: bool = False):
+        conn = getattr(self._local, "conn", None)
+        idle = time.monotonic() - getattr(self._local, "last_used", 0)
+        if conn is not None and (fresh or idle > IDLE_RECONNECT_SECONDS):
+            conn.close()
+            conn = None
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    @staticmethod
+    def _files(method_name: str, args):
+        files = {}
+        for index in FILE_ARGS.get(method_name, ()):
+            if index < len(args) and args[index]:
+                with open(args[index], "rb") as f:
+                    files[str(index)] = {"name": os.path.basename(args[index]),
+                                         "data": base64.b64encode(f.read()).decode("ascii")}
+        return files
+
+    def _call(self, method_name: str, args, kwargs):
+        body = json.dumps({"method": method_name, "args": list(args), "kwargs": kwargs,
+                           "files": self._files(method_name, args)},
+                          ensure_ascii=False, default=str).encode("utf-8")
+        headers = {"Content-Type": "application/json", TOKEN_HEADER: self.token}
+        read = is_read_method(method_name)
+        with Span(f"db.{method_name}", remote=True):
+            for attempt in range(2):
+                sent = False
+                try:
+                    conn = self._connection(fresh=attempt > 0)
+                    conn.request("POST", "/call", body, headers)
+                    sent = True
+                    reply = conn.getresponse()
+                    response = json.loads(reply.read())
+                    self._local.last_used = time.monotonic()
+                    break
+                except (OSError, http.client.HTTPException) as e:
+                    self._drop_connection()
+                    # 写请求已经发出时服务端可能已经执行，不能重试
+                    if attempt or (sent and not read):
+                        raise DatabaseServiceError(f"数据库服务调用失败: {e}") from e
+        if reply.status == 403:
+            raise DatabaseServiceError(response.get("error", "访问被拒绝"))
+        if "error" in response:
+            raise DatabaseServiceError(response["error"])
+        return response["result"]
+
+    def __getattr__(self, method_name):
+        if method_name.startswith("_"):
+            raise AttributeError(method_name)
+
+        def remote_method(*args, **kwargs):
+            return self._call(method_name, args, kwargs)
+        remote_method.__name__ = method_name
+        return remote_method
+
+
+def create_database_manager():
+    """创建数据库管理器：设置了数据库服务地址时使用服务，否则直接访问数据库文件"""
+    url = os.environ.get(DB_SERVICE_ENV)
+    if url:
+        return RemoteDatabaseManager(url)
+    from modules import DatabaseManager
+    return DatabaseManager()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="E-FAI 数据库服务")
+    parser.add_argument("--host", default="127.0.0.1", help="其他工位访问时改为本机网卡地址，并设置令牌")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token", default=os.environ.get(DB_SERVICE_TOKEN_ENV))
+    parser.add_argument("--cache-entries", type=int, default=1000)
+    parser.add_argument("--cache-ttl", type=float, default=5.0)
+    options = parser.parse_args()
+    DatabaseService(max_cache_entries=options.cache_entries, cache_ttl=options.cache_ttl).serve(
+        options.host, options.port, options.token)
@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class DrawingIndex:
+    """图纸特征索引：按 drawing_path 持久化保存预先计算的哈希特征
+
+    索引保存在单独的 SQLite 文件中，不修改主数据库结构。每条记录带有文件的
+    修改时间和大小，图纸文件变化后记录自动失效并重新计算。
+    同一型号的多个SKU共用一张图纸时，每个SKU各有一条记录，互不覆盖。
+    """
+
+    # 索引结构版本，旧版本的索引只是缓存，直接重建
+    SCHEMA_VERSION = 2
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS drawing_features")
+                conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS drawing_features (
+                    sku TEXT NOT NULL,
+                    drawing_path TEXT NOT NULL,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    features BLOB NOT NULL,
+                    PRIMARY KEY (sku, drawing_path)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_drawing_features_path ON drawing_features (drawing_path)")
+
+    @contextmanager
+    def _connect(self):
+        """打开连接，退出时提交并关闭"""
+        conn = sqlite3.connect(self.index_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _stat(drawing_path: str):
+        """返回 (mtime, size)，文件不存在返回 None"""
+        try:
+            stat = os.stat(drawing_path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def get(self, drawing_path: str, sku: str = None):
+        """读取图纸特征，文件已变化或没有记录时返回 None
+
+        特征只取决于图纸内容，其他SKU有有效记录时同样可用；sku 自己还没有记录时
+        顺便复制一条，之后 sku_matrix(sku) 也能读到这张图纸。
+        """
+        stat = self._stat(drawing_path)
+        if stat is None:
+            return None
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT sku, mtime, size, features FROM drawing_features WHERE drawing_path = ?",
+                (drawing_path,)).fetchall()
+            valid = [row for row in rows if (row[1], row[2]) == stat]
+            if not valid:
+                return None
+            if sku is not None and all(row[0] != sku for row in valid):
+                conn.execute(
+                    "INSERT OR REPLACE INTO drawing_features (sku, drawing_path, mtime, size, features) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (sku, drawing_path, stat[0], stat[1], valid[0][3]))
+        return np.frombuffer(valid[0][3], dtype=np.uint64).copy()
+
+    def put(self, sku: str, drawing_path: str, features: np.ndarray):
+        """保存图纸特征"""
+        stat = self._stat(drawing_path)
+        if stat is None or features is None:
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO drawing_features (sku, drawing_path, mtime, size, features) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (sku, drawing_path, stat[0], stat[1], features.astype(np.uint64).tobytes()))
+
+    def sku_matrix(self, sku: str):
+        """读取SKU下所有仍然有效的图纸特征
+
+        Returns:
+            tuple: (图纸路径列表, 形如 (N, 2) 的 uint64 特征矩阵)
+        """
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT drawing_path, mtime, size, features FROM drawing_features WHERE sku = ?",
+                (sku,)).fetchall()
+        paths = []
+        features = []
+        for drawing_path, mtime, size, blob in rows:
+            if self._stat(drawing_path) == (mtime, size):
+                paths.append(drawing_path)
+                features.append(np.frombuffer(blob, dtype=np.uint64))
+        if not features:
+            return paths, np.empty((0, 2), dtype=np.uint64)
+        return paths, np.vstack(features)
+
+    def prune(self, sku: str, keep_paths):
+        """删除SKU下已不在图纸表中的记录"""
+        keep_paths = set(keep_paths)
+        with self._lock, self._connect() as conn:
+            rows = conn.execute("SELECT drawing_path FROM drawing_features WHERE sku = ?", (sku,)).fetchall()
+            stale = [(sku, row[0]) for row in rows if row[0] not in keep_paths]
+            conn.executemany("DELETE FROM drawing_features WHERE sku = ? AND drawing_path = ?", stale)
+        return len(stale)
+
+    def remove_sku(self, sku: str):
+        """删除SKU的全部记录"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM drawing_features WHERE sku = ?", (sku,))
@@ -0,0 +1,182 @@
+import errno
+import itertools
+import os
+import shutil
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Signal
+
+from modules.Script.perfTrace import trace
+
+
+# 共享目录上可能短暂出现、重试后会恢复的错误
+TRANSIENT_ERRNOS = {errno.EACCES, errno.EBUSY, errno.EAGAIN, errno.ETIMEDOUT, errno.EIO}
+# Windows：文件被占用、网络路径暂时不可用、网络名不再可用、信号灯超时等
+TRANSIENT_WINERRORS = {32, 33, 53, 59, 64, 67, 121, 1231}
+# 复制时每次读写的块大小
+CHUNK_SIZE = 1024 * 1024
+
+
+def is_transient(error: OSError) -> bool:
+    if getattr(error, "winerror", None) in TRANSIENT_WINERRORS:
+        return True
+    return error.errno in TRANSIENT_ERRNOS
+
+
+def _remove_readonly(func, path, exc_info):
+    """rmtree 遇到只读文件时去掉只读属性再删除"""
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+class FileOpsService(QObject):
+    """文件操作服务：在后台线程池中复制、移动、删除SKU的文件和文件夹
+
+    每个操作返回任务编号，通过信号报告进度和结果。共享目录上的临时错误
+    （文件被占用、网络短暂中断）会按退避间隔重试。替换文件时先把新文件复制到
+    临时文件名，成功后再与旧文件交换；删除文件夹时先改名移走，再在后台慢慢删除，
+    中途失败不会留下删了一半的数据。
+    """
+
+    # 任务编号, 已完成字节数, 总字节数
+    progress = Signal(str, int, int)
+    # 任务编号
+    finished = Signal(str)
+    # 任务编号, 错误信息
+    failed = Signal(str, str)
+
+    def __init__(self, max_workers: int = 2, retries: int = 3, retry_delay: float = 0.5, parent=None):
+        super().__init__(parent)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._ids = itertools.count(1)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="file_ops")
+
+    def _submit(self, name: str, func, *args) -> str:
+        task_id = f"{name}-{next(self._ids)}"
+        self._pool.submit(self._run, task_id, func, *args)
+        return task_id
+
+    def _run(self, task_id: str, func, *args):
+        try:
+            with trace(f"file_ops.{task_id.split('-')[0]}"):
+                func(task_id, *args)
+        except Exception as e:
+            self.failed.emit(task_id, str(e))
+        else:
+            self.finished.emit(task_id)
+
+    def _retry(self, func, *args):
+        """执行文件操作，临时错误时重试"""
+        for attempt in range(self.retries + 1):
+            try:
+                return func(*args)
+            except OSError as e:
+                if attempt == self.retries or not is_transient(e):
+                    raise
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+    # ---------------------------------------------------------------
+    # 对外接口
+
+    def copy_file(self, src: str, dst: str) -> str:
+        """复制文件，目标已存在时覆盖"""
+        return self._submit("copy", self._copy_file, src, dst)
+
+    def replace_file(self, src: str, dst: str) -> str:
+        """用新文件替换目标文件：先复制到临时文件，成功后再交换，失败时保留原文件"""
+        return self._submit("replace", self._replace_file, src, dst)
+
+    def move(self, src: str, dst: str) -> str:
+        """移动文件或文件夹，同一磁盘上直接改名"""
+        return self._submit("move", self._move, src, dst)
+
+    def delete(self, path: str) -> str:
+        """删除文件或文件夹，不存在时直接完成"""
+        return self._submit("delete", self._delete, path)
+
+    def call(self, name: str, func, *args) -> str:
+        """在后台执行其他文件操作函数，同样报告完成或失败"""
+        return self._submit(name, lambda task_id, *args: self._retry(func, *args), *args)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    # ---------------------------------------------------------------
+    # 工作线程中执行
+
+    def _copy_file(self, task_id: str, src: str, dst: str):
+        total = self._retry(os.path.getsize, src)
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        self._retry(self._copy_chunks, task_id, src, dst, total)
+        self._retry(shutil.copystat, src, dst)
+
+    def _copy_chunks(self, task_id: str, src: str, dst: str, total: int):
+        done = 0
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                target.write(chunk)
+                done += len(chunk)
+                self.progress.emit(task_id, done, total)
+
+    def _replace_file(self, task_id: str, src: str, dst: str):
+        staging = dst + ".staging"
+        backup = dst + ".bak"
+        try:
+            self._copy_file(task_id, src, staging)
+        except OSError:
+            self._discard(staging)
+            raise
+        had_old = os.path.exists(dst)
+        if had_old:
+            self._retry(os.replace, dst, backup)
+        try:
+            self._retry(os.replace, staging, dst)
+        except OSError:
+            # 交换失败，恢复原文件
+            if had_old:
+                self._retry(os.replace, backup, dst)
+            self._discard(staging)
+            raise
+        if had_old:
+            self._discard(backup)
+
+    def _move(self, task_id: str, src: str, dst: str):
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        try:
+            self._retry(os.replace, src, dst)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV and getattr(e, "winerror", None) != 17:
+                raise
+        # 跨磁盘：先完整复制，成功后再删除源
+        if os.path.isdir(src):
+            self._retry(shutil.copytree, src, dst)
+        else:
+            self._copy_file(task_id, src, dst)
+        self._delete(task_id, src)
+
+    def _delete(self, task_id: str, path: str):
+        if not os.path.lexists(path):
+            return
+        # 先改名移走，原路径立即空出来，后面的删除慢或失败都不影响重新上传
+        trash = f"{path}.deleting-{int(time.time() * 1000)}"
+        self._retry(os.replace, path, trash)
+        self._discard(trash)
+
+    def _discard(self, path: str):
+        """删除临时文件或移走的文件夹，重试后仍失败则留给下次清理"""
+        if not os.path.lexists(path):
+            return
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                self._retry(shutil.rmtree, path, False, _remove_readonly)
+            else:
+                self._retry(os.remove, path)
+        except OSError as e:
+            print(f"删除 {path} 失败: {e}")
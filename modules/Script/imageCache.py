@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import OrderedDict
+
+from PySide6.QtCore import QSize, Qt
+from PySide6.QtGui import QImage, QImageReader
+
+
+class ImageCache:
+    """进程内共享的图片缓存
+
+    以 (路径, 修改时间, 目标尺寸) 为键缓存解码后的 QImage，以 (路径, 修改时间)
+    为键缓存原始文件字节，按总字节数做LRU淘汰。QImage 可以跨线程传递，
+    所有操作加锁，工作线程可以直接使用；解码在锁外进行，不会阻塞其他线程。
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (value, nbytes)
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _mtime(path: str):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _put(self, key, value, nbytes: int):
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            self._evict()
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+
+    def image(self, path: str, size=None) -> QImage:
+        """读取图片
+
+        Args:
+            path: 图片路径
+            size: 目标尺寸 (宽, 高)，按比例缩放到不超过该尺寸；为空时返回原图
+
+        Returns:
+            QImage: 读取失败时返回空 QImage
+        """
+        mtime = self._mtime(path)
+        if mtime is None:
+            return QImage()
+        size = tuple(size) if size else None
+        key = ("image", path, mtime, size)
+        image = self._get(key)
+        if image is not None:
+            return image
+
+        if size is None:
+            image = QImage(path)
+        else:
+            # 原图已在缓存中时直接缩放，否则让解码器按目标尺寸解码（JPEG可以少解码很多像素）
+            with self._lock:
+                full = self._entries.get(("image", path, mtime, None))
+            if full is not None:
+                image = full[0].scaled(size[0], size[1], Qt.AspectRatioMode.KeepAspectRatio,
+                                       Qt.TransformationMode.SmoothTransformation)
+            else:
+                image = self._read_scaled(path, size)
+        if not image.isNull():
+            self._put(key, image, image.sizeInBytes())
+        return image
+
+    @staticmethod
+    def _read_scaled(path: str, size) -> QImage:
+        reader = QImageReader(path)
+        original = reader.size()
+        if original.isValid() and (original.width() > size[0] or original.height() > size[1]):
+            reader.setScaledSize(original.scaled(QSize(size[0], size[1]), Qt.AspectRatioMode.KeepAspectRatio))
+        return reader.read()
+
+    def data(self, path: str):
+        """读取文件原始字节，失败返回 None"""
+        mtime = self._mtime(path)
+        if mtime is None:
+            return None
+        key = ("data", path, mtime)
+        data = self._get(key)
+        if data is not None:
+            return data
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._put(key, data, len(data))
+        return data
+
+    def invalidate(self, path: str):
+        """删除某个文件的所有缓存"""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == path]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def describe(self) -> str:
+        """诊断页面显示用的摘要"""
+        return (f"命中率 {self.hit_rate():.0%}（{self.hits}/{self.hits + self.misses}），"
+                f"{len(self._entries)} 项，{self.current_bytes / 1024 / 1024:.1f}/{self.max_bytes / 1024 / 1024:.0f} MB")
+
+
+# 进程内共享的图片缓存，EFAI_IMAGE_CACHE_MB 可调整容量
+image_cache = ImageCache(int(os.environ.get("EFAI_IMAGE_CACHE_MB", 256)) * 1024 * 1024)
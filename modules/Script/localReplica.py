@@ -0,0 +1,466 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from logging.handlers import RotatingFileHandler
+
+
+logger = logging.getLogger("efai.sync")
+logger.propagate = False
+
+# 副本内部使用的表和触发器的前缀，不参与同步
+INTERNAL_PREFIX = "_replica_"
+
+
+def _ident(name: str) -> str:
+    """SQL标识符"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(text: str) -> str:
+    """SQL字符串常量"""
+    return "'" + text.replace("'", "''") + "'"
+
+
+def _connect(path: str, timeout: float = 30):
+    # 自己管理事务
+    return sqlite3.connect(path, timeout=timeout, isolation_level=None)
+
+
+class _TableInfo:
+    """表结构：列名，以及 INTEGER PRIMARY KEY（rowid的别名）列"""
+
+    def __init__(self, conn, schema: str, table: str):
+        rows = conn.execute(f"PRAGMA {schema}.table_info({_ident(table)})").fetchall()
+        self.columns = [row[1] for row in rows]
+        pk_rows = [row for row in rows if row[5]]
+        self.rowid_alias = None
+        if len(pk_rows) == 1 and pk_rows[0][2].upper() == "INTEGER":
+            self.rowid_alias = pk_rows[0][1]
+
+
+class LocalReplica:
+    """数据库本地副本：界面读写本地SQLite文件，后台线程与共享目录上的中心数据库同步
+
+    本地每张表装有触发器，写操作连同修改前后的行记录到变更日志。同步时先把
+    变更按顺序推送到中心数据库：修改前比对中心数据库里这次改动的列与修改前的值，
+    其他工位已把同一列改成别的值时以中心数据库为准，记录冲突并跳过这一列。
+    推送进度与变更在同一个中心事务里登记，推送后清理本地日志失败也不会重复推送。
+    推送完成后把中心数据库拷贝到本地临时文件，再在一个短事务里替换本地数据，
+    网络读写都不占用本地数据库的写锁。网络不可用时变更保留在日志里，下次重试。
+    """
+
+    def __init__(self, central_path: str, local_path: str, log_dir: str, interval: float = 30.0):
+        self.central_path = central_path
+        self.local_path = local_path
+        self.interval = interval
+        self.last_sync = None
+        self.last_error = None
+        self.conflicts = 0
+        # 上次拉取时中心数据库文件的 (mtime, size)，没有变化时不重新拉取
+        self._central_stat = None
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="replica_sync", daemon=True)
+
+        os.makedirs(log_dir, exist_ok=True)
+        if not logger.handlers:
+            handler = RotatingFileHandler(os.path.join(log_dir, "sync.log"), maxBytes=2 * 1024 * 1024,
+                                          backupCount=3, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+    def prepare(self) -> str:
+        """准备本地副本，返回本地数据库路径
+
+        本地副本还有未同步的变更时直接使用；否则从中心数据库拷贝最新数据，
+        中心数据库不可用时使用已有的本地副本离线启动。
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.local_path)), exist_ok=True)
+        has_local = os.path.exists(self.local_path)
+        if not (has_local and self.pending_changes()):
+            try:
+                self._central_stat = self._stat_central()
+                self._copy_central(self.local_path)
+            except (sqlite3.Error, OSError) as e:
+                if not has_local:
+                    raise
+                self._central_stat = None
+                logger.info(f"中心数据库不可用，使用本地副本离线启动: {e}")
+
+        conn = _connect(self.local_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._create_internal_tables(conn)
+            self._install_triggers(conn)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return self.local_path
+
+    def start(self):
+        self._thread.start()
+
+    def shutdown(self, timeout: float = 10):
+        """停止后台同步，并尽量把剩余的变更推送出去"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        try:
+            self.sync_now()
+        except (sqlite3.Error, OSError) as e:
+            logger.info(f"退出时同步失败，变更保留到下次启动: {e}")
+
+    def pending_changes(self) -> int:
+        conn = _connect(self.local_path)
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {INTERNAL_PREFIX}changelog").fetchone()[0]
+        except sqlite3.OperationalError:
+            return 0
+        finally:
+            conn.close()
+
+    def describe(self) -> str:
+        """诊断页面显示用的摘要"""
+        last_sync = time.strftime("%H:%M:%S", time.localtime(self.last_sync)) if self.last_sync else "未同步"
+        text = f"待同步 {self.pending_changes()} 条，上次同步 {last_sync}，冲突 {self.conflicts} 次"
+        if self.last_error:
+            text += f"，错误: {self.last_error}"
+        return text
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync_now()
+            except (sqlite3.Error, OSError) as e:
+                self.last_error = str(e)
+                logger.info(f"同步失败: {e}")
+
+    def sync_now(self):
+        """推送本地变更并拉取中心数据库的最新数据
+
+        Returns:
+            tuple: (推送的变更数, 冲突数)
+        """
+        with self._sync_lock:
+            pushed, conflicts = self._push()
+            self._pull(force=pushed > 0)
+            self.last_sync = time.time()
+            self.last_error = None
+            return pushed, conflicts
+
+    # ---------------------------------------------------------------
+    # 本地表和触发器
+
+    @staticmethod
+    def _user_tables(conn, schema: str = "main"):
+        rows = conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'").fetchall()
+        tables = []
+        for (name,) in rows:
+            if name.startswith("sqlite_") or name.startswith(INTERNAL_PREFIX):
+                continue
+            try:
+                # WITHOUT ROWID 表无法按rowid跟踪，不参与同步
+                conn.execute(f"SELECT rowid FROM {schema}.{_ident(name)} LIMIT 0")
+            except sqlite3.OperationalError:
+                logger.info(f"表 {name} 没有rowid，不参与同步")
+                continue
+            tables.append(name)
+        return tables
+
+    @staticmethod
+    def _create_internal_tables(conn):
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {INTERNAL_PREFIX}changelog (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tbl TEXT NOT NULL,
+                op TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                old_values TEXT,
+                new_values TEXT,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {INTERNAL_PREFIX}conflicts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tbl TEXT NOT NULL,
+                op TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                local_values TEXT,
+                reason TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # station：本副本的编号；session：本地rowid与中心数据库一致的一段时间，每次拉取替换数据后更换
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {INTERNAL_PREFIX}state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        for key in ("station", "session"):
+            conn.execute(f"INSERT OR IGNORE INTO {INTERNAL_PREFIX}state VALUES (?, ?)", (key, uuid.uuid4().hex))
+
+    @staticmethod
+    def _create_central_tables(conn):
+        # 每个副本会话已推送到的变更日志编号，推送和登记在同一个事务里，重复推送时跳过
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {INTERNAL_PREFIX}applied (
+                station TEXT NOT NULL,
+                session TEXT NOT NULL,
+                last_id INTEGER NOT NULL,
+                PRIMARY KEY (station, session)
+            )
+        """)
+        # 本地新增的行在中心数据库的rowid，没能写入中心数据库的为 NULL；会话结束（本地数据替换为中心数据）后删除
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {INTERNAL_PREFIX}rowmap (
+                station TEXT NOT NULL,
+                session TEXT NOT NULL,
+                tbl TEXT NOT NULL,
+                local_rowid INTEGER NOT NULL,
+                central_rowid INTEGER,
+                PRIMARY KEY (station, session, tbl, local_rowid)
+            )
+        """)
+
+    @staticmethod
+    def _state(conn):
+        return dict(conn.execute(f"SELECT key, value FROM {INTERNAL_PREFIX}state").fetchall())
+
+    def _drop_triggers(self, conn):
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall()
+        for (name,) in rows:
+            if name.startswith(INTERNAL_PREFIX):
+                conn.execute(f"DROP TRIGGER {_ident(name)}")
+
+    def _install_triggers(self, conn):
+        """给每张表装上记录变更的触发器，行值用 quote() 保存为SQL常量，BLOB也能原样还原"""
+        self._drop_triggers(conn)
+        for table in self._user_tables(conn):
+            columns = _TableInfo(conn, "main", table).columns
+
+            def row_json(prefix):
+                pairs = ", ".join(f"{_literal(column)}, quote({prefix}.{_ident(column)})" for column in columns)
+                return f"json_object({pairs})"
+
+            statements = {
+                "INSERT": ("NEW.rowid", "NULL", row_json("NEW")),
+                "UPDATE": ("NEW.rowid", row_json("OLD"), row_json("NEW")),
+                "DELETE": ("OLD.rowid", row_json("OLD"), "NULL"),
+            }
+            for op, (row_id, old_values, new_values) in statements.items():
+                trigger = _ident(f"{INTERNAL_PREFIX}{op.lower()}_{table}")
+                conn.execute(f"""
+                    CREATE TRIGGER {trigger} AFTER {op} ON {_ident(table)}
+                    BEGIN
+                        INSERT INTO {INTERNAL_PREFIX}changelog (tbl, op, row_id, old_values, new_values)
+                        VALUES ({_literal(table)}, '{op}', {row_id}, {old_values}, {new_values});
+                    END
+                """)
+
+    # ---------------------------------------------------------------
+    # 推送
+
+    def _push(self):
+        local = _connect(self.local_path)
+        try:
+            changes = local.execute(
+                f"SELECT id, tbl, op, row_id, old_values, new_values FROM {INTERNAL_PREFIX}changelog ORDER BY id"
+            ).fetchall()
+            state = self._state(local)
+        finally:
+            local.close()
+        if not changes:
+            return 0, 0
+        station, session = state["station"], state["session"]
+
+        conflicts = []
+        central = _connect(self.central_path)
+        try:
+            # 推送期间独占中心数据库的写锁，其他工位的推送排队，冲突判断才可靠
+            central.execute("BEGIN IMMEDIATE")
+            self._create_central_tables(central)
+            for table in ("applied", "rowmap"):
+                central.execute(f"DELETE FROM {INTERNAL_PREFIX}{table} WHERE station = ? AND session != ?",
+                                (station, session))
+            row = central.execute(f"SELECT last_id FROM {INTERNAL_PREFIX}applied WHERE station = ? AND session = ?",
+                                  (station, session)).fetchone()
+            last_applied = row[0] if row else 0
+            rowmap = {(tbl, local_rowid): central_rowid for tbl, local_rowid, central_rowid in central.execute(
+                f"SELECT tbl, local_rowid, central_rowid FROM {INTERNAL_PREFIX}rowmap WHERE station = ? AND session = ?",
+                (station, session))}
+            tables = {}
+            for change in changes:
+                if change[0] <= last_applied:
+                    continue
+                new_rowid = []
+                reason = self._apply(central, change, rowmap, new_rowid, tables)
+                if new_rowid:
+                    central.execute(f"INSERT OR REPLACE INTO {INTERNAL_PREFIX}rowmap VALUES (?, ?, ?, ?, ?)",
+                                    (station, session, change[1], change[3], new_rowid[0]))
+                if reason:
+                    conflicts.append((change, reason))
+            central.execute(f"INSERT OR REPLACE INTO {INTERNAL_PREFIX}applied VALUES (?, ?, ?)",
+                            (station, session, changes[-1][0]))
+            central.execute("COMMIT")
+        except BaseException:
+            if central.in_transaction:
+                central.execute("ROLLBACK")
+            raise
+        finally:
+            central.close()
+
+        for (_, tbl, op, row_id, _, new_values), reason in conflicts:
+            logger.info(f"同步冲突 {tbl} {op} rowid={row_id}: {reason}，本地值 {new_values}")
+        self.conflicts += len(conflicts)
+        pushed = sum(1 for change in changes if change[0] > last_applied)
+        logger.info(f"推送 {pushed} 条变更，冲突 {len(conflicts)} 条")
+        # 这里失败时中心数据库已记录推送进度，下次推送跳过这些变更
+        self._clear_pushed(changes[-1][0], conflicts)
+        return pushed, len(conflicts)
+
+    def _clear_pushed(self, last_id: int, conflicts):
+        """删除已推送的变更日志，保存冲突记录"""
+        local = _connect(self.local_path)
+        try:
+            local.execute("BEGIN IMMEDIATE")
+            local.execute(f"DELETE FROM {INTERNAL_PREFIX}changelog WHERE id <= ?", (last_id,))
+            local.executemany(
+                f"INSERT INTO {INTERNAL_PREFIX}conflicts (tbl, op, row_id, local_values, reason) VALUES (?, ?, ?, ?, ?)",
+                [(tbl, op, row_id, new_values or old_values, reason)
+                 for (_, tbl, op, row_id, old_values, new_values), reason in conflicts])
+            local.execute("COMMIT")
+        finally:
+            local.close()
+
+    def _apply(self, central, change, rowmap, new_rowid, tables):
+        """在中心数据库执行一条变更，有冲突时返回原因，没有返回 None
+
+        修改只比对和写入这次改动的列：其他工位改了同一行的其他列不算冲突，
+        也不会被覆盖；同一列被其他工位改成别的值时以中心数据库为准，只跳过这一列。
+        删除时整行与修改前的值不一致视为冲突，不删除。
+        本地新增的行没能写入中心数据库时记为没有对应行，之后对它的修改和删除都是冲突，
+        不会按本地rowid落到中心数据库里的其他行上。
+        """
+        _, table, op, row_id, old_values, new_values = change
+        if table not in tables:
+            exists = central.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                     (table,)).fetchone()
+            tables[table] = _TableInfo(central, "main", table) if exists else None
+        info = tables[table]
+        if info is None:
+            return "中心数据库没有这张表"
+        if op != "INSERT" and (table, row_id) in rowmap and rowmap[(table, row_id)] is None:
+            return "本地新增的这一行没能写入中心数据库"
+        central_rowid = rowmap.get((table, row_id), row_id)
+        old = {column: value for column, value in json.loads(old_values or "{}").items() if column in info.columns}
+        # 行值是 quote() 生成的SQL常量，可以直接拼进语句
+        new = {column: value for column, value in json.loads(new_values or "{}").items()
+               if column in info.columns and column != info.rowid_alias}
+
+        try:
+            if op == "INSERT":
+                cursor = central.execute(
+                    f"INSERT INTO {_ident(table)} ({', '.join(_ident(column) for column in new)}) "
+                    f"VALUES ({', '.join(new.values())})")
+                rowmap[(table, row_id)] = cursor.lastrowid
+                new_rowid.append(cursor.lastrowid)
+                return None
+
+            columns = list(old) if op == "DELETE" else [column for column in new if old.get(column) != new[column]]
+            if not columns:
+                return None
+            current = central.execute(
+                f"SELECT {', '.join(f'quote({_ident(column)})' for column in columns)} "
+                f"FROM {_ident(table)} WHERE rowid = ?", (central_rowid,)).fetchone()
+            if current is None:
+                return "中心数据库中这一行已被删除"
+            current = dict(zip(columns, current))
+
+            if op == "DELETE":
+                if any(current[column] != old[column] for column in columns):
+                    return "中心数据库中这一行已被其他工位修改"
+                central.execute(f"DELETE FROM {_ident(table)} WHERE rowid = ?", (central_rowid,))
+                return None
+
+            conflicted = [column for column in columns if current[column] not in (old.get(column), new[column])]
+            pending = [column for column in columns if column not in conflicted and current[column] != new[column]]
+            if pending:
+                assignments = ", ".join(f"{_ident(column)} = {new[column]}" for column in pending)
+                central.execute(f"UPDATE {_ident(table)} SET {assignments} WHERE rowid = ?", (central_rowid,))
+            if conflicted:
+                return f"中心数据库中 {', '.join(conflicted)} 已被其他工位修改"
+        except sqlite3.IntegrityError as e:
+            if op == "INSERT":
+                rowmap[(table, row_id)] = None
+                new_rowid.append(None)
+            return f"违反约束: {e}"
+        return None
+
+    # ---------------------------------------------------------------
+    # 拉取
+
+    def _stat_central(self):
+        stat = os.stat(self.central_path)
+        return stat.st_mtime, stat.st_size
+
+    def _copy_central(self, target_path: str):
+        """用SQLite备份接口拷贝中心数据库，先写临时文件再替换，拷贝中断不会留下半个文件"""
+        temp_path = target_path + ".tmp"
+        source = sqlite3.connect(self.central_path, timeout=30)
+        try:
+            target = sqlite3.connect(temp_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+        os.replace(temp_path, target_path)
+
+    def _pull(self, force: bool = False):
+        stat = self._stat_central()
+        if not force and stat == self._central_stat:
+            return False
+        pulled_path = self.local_path + ".pulled"
+        self._copy_central(pulled_path)
+
+        local = _connect(self.local_path)
+        try:
+            local.execute("ATTACH DATABASE ? AS pulled", (pulled_path,))
+            local.execute("BEGIN IMMEDIATE")
+            # 拉取期间本地又有新的修改，这次不替换，推送后下一轮再拉取
+            if local.execute(f"SELECT COUNT(*) FROM {INTERNAL_PREFIX}changelog").fetchone()[0]:
+                local.execute("ROLLBACK")
+                return False
+            self._drop_triggers(local)
+            local_tables = set(self._user_tables(local))
+            for table in self._user_tables(local, "pulled"):
+                if table not in local_tables:
+                    continue
+                local_info = _TableInfo(local, "main", table)
+                pulled_info = _TableInfo(local, "pulled", table)
+                columns = [column for column in local_info.columns if column in pulled_info.columns]
+                if local_info.rowid_alias is None:
+                    columns = ["rowid"] + columns
+                column_list = ", ".join(column if column == "rowid" else _ident(column) for column in columns)
+                local.execute(f"DELETE FROM main.{_ident(table)}")
+                local.execute(f"INSERT INTO main.{_ident(table)} ({column_list}) "
+                              f"SELECT {column_list} FROM pulled.{_ident(table)}")
+            # 本地rowid已与中心数据库一致，开始新的会话
+            local.execute(f"UPDATE {INTERNAL_PREFIX}state SET value = ? WHERE key = 'session'", (uuid.uuid4().hex,))
+            self._install_triggers(local)
+            local.execute("COMMIT")
+        except BaseException:
+            if local.in_transaction:
+                local.execute("ROLLBACK")
+            raise
+        finally:
+            local.close()
+            try:
+                os.remove(pulled_path)
+            except OSError:
+                pass
+        self._central_stat = stat
+        return True
@@ -0,0 +1,133 @@
+import ctypes
+import logging
+import os
+import sys
+import tracemalloc
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtWidgets import QApplication
+
+
+logger = logging.getLogger("efai.memory")
+logger.propagate = False
+
+
+def process_memory_mb():
+    """当前进程占用的物理内存（MB），无法获取时返回 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize / 1024 / 1024
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+
+def qt_object_counts():
+    """统计所有顶层窗口及其子对象，按类名计数"""
+    counts = Counter()
+    for top in QApplication.topLevelWidgets():
+        counts[type(top).__name__] += 1
+        for child in top.findChildren(QObject):
+            counts[type(child).__name__] += 1
+    return counts
+
+
+class MemoryProfiler(QObject):
+    """长时间运行的内存诊断模式
+
+    定时对 tracemalloc 做快照，与上一次快照比较，记录增长最多的代码位置；
+    同时按类名统计Qt对象数量，记录数量增加的类。结果写到 memory.log。
+    定时器运行在界面线程，Qt对象的遍历只能在界面线程中进行。
+    """
+
+    def __init__(self, log_dir: str, interval_minutes: float = 5, top: int = 15, frames: int = 10, parent=None):
+        super().__init__(parent)
+        self.top = top
+        self.frames = frames
+        self._snapshot = None
+        self._baseline = None
+        self._counts = Counter()
+
+        os.makedirs(log_dir, exist_ok=True)
+        if not logger.handlers:
+            handler = RotatingFileHandler(os.path.join(log_dir, "memory.log"), maxBytes=5 * 1024 * 1024,
+                                          backupCount=3, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(interval_minutes * 60 * 1000))
+        self._timer.timeout.connect(self.sample)
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.sample()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+        tracemalloc.stop()
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def sample(self):
+        """采样一次并把与上一次的差异写入日志"""
+        snapshot = self._take_snapshot()
+        counts = qt_object_counts()
+        current, peak = tracemalloc.get_traced_memory()
+        memory = process_memory_mb()
+        lines = [f"进程内存 {memory:.1f} MB" if memory is not None else "进程内存 未知",
+                 f"Python跟踪内存 {current / 1024 / 1024:.1f} MB（峰值 {peak / 1024 / 1024:.1f} MB）",
+                 f"Qt对象总数 {sum(counts.values())}"]
+
+        if self._snapshot is not None:
+            lines.append("Python内存增长（与上次采样相比）:")
+            for stat in self._snapshot_diff(snapshot, self._snapshot):
+                lines.append(f"  {stat}")
+            lines.append("Python内存增长（与开始时相比）:")
+            for stat in self._snapshot_diff(snapshot, self._baseline):
+                lines.append(f"  {stat}")
+
+            growth = counts.copy()
+            growth.subtract(self._counts)
+            grown = [(name, delta) for name, delta in growth.most_common(self.top) if delta > 0]
+            if grown:
+                lines.append("Qt对象数量增长:")
+                for name, delta in grown:
+                    lines.append(f"  {name}: +{delta}（共 {counts[name]}）")
+        else:
+            self._baseline = snapshot
+
+        self._snapshot = snapshot
+        self._counts = counts
+        logger.info("\n".join(lines))
+
+    def _snapshot_diff(self, snapshot, previous):
+        stats = snapshot.compare_to(previous, "lineno")
+        return [stat for stat in stats if stat.size_diff > 0][:self.top]
@@ -0,0 +1,301 @@
+import json
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+
+from PySide6.QtCore import QObject, Signal
+
+from modules.Script.perfTrace import trace
+
+try:
+    from modules.Script import unoConvert
+except ImportError:
+    # 程序的 Python 没有 uno 模块时，用 LibreOffice 自带的 Python 运行 unoConvert.py
+    unoConvert = None
+
+
+# Windows 下 LibreOffice 的默认安装位置
+WINDOWS_SOFFICE_PATHS = [
+    r"C:\Program Files\LibreOffice\program\soffice.exe",
+    r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+]
+
+# 常驻进程的监听地址，与 unoConvert.accept_string 一致
+ACCEPT_FORMAT = "socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+
+UNO_CONVERT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "unoConvert.py")
+
+
+def find_soffice():
+    """查找 LibreOffice 可执行文件，找不到返回 None"""
+    for name in ("soffice", "libreoffice"):
+        path = shutil.which(name)
+        if path:
+            return path
+    for path in WINDOWS_SOFFICE_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def find_office_python(soffice_path: str):
+    """查找 LibreOffice 自带的 Python（与 soffice 在同一目录），找不到返回 None"""
+    program_dir = os.path.dirname(os.path.realpath(soffice_path))
+    for name in ("python.exe", "python", "python3"):
+        path = os.path.join(program_dir, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _file_url(path: str) -> str:
+    return "file:///" + path.replace(os.sep, "/").lstrip("/")
+
+
+def _kill_tree(process):
+    """结束 soffice 及其启动的 soffice.bin"""
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        process.kill()
+
+
+class PdfConverter(QObject):
+    """报告PDF导出：后台队列把 .docx 转换为 .pdf
+
+    转换线程启动时就拉起一个常驻的无界面 LibreOffice（--accept 监听本机端口），
+    之后每个文档都通过 UNO 交给这个进程转换，不再每次冷启动 soffice。
+    程序的 Python 能导入 uno 时在进程内调用，否则用 LibreOffice 自带的 Python
+    运行 unoConvert.py；两者都不可用时退回每批启动一次 soffice --convert-to。
+    常驻进程退出或转换超时会被结束，下一批重新拉起。
+    """
+
+    # docx路径, pdf路径
+    converted = Signal(str, str)
+    # docx路径, 错误信息
+    failed = Signal(str, str)
+
+    def __init__(self, soffice_path: str = None, timeout: int = 120, batch_wait: float = 1.0, parent=None):
+        super().__init__(parent)
+        self.soffice_path = soffice_path or find_soffice()
+        self.timeout = timeout
+        # 收到第一个任务后等待一小段时间，把随后到达的文档合并到同一批
+        self.batch_wait = batch_wait
+        self.office_python = None
+        if self.soffice_path is not None and unoConvert is None and os.path.exists(UNO_CONVERT_SCRIPT):
+            self.office_python = find_office_python(self.soffice_path)
+        self._queue = queue.Queue()
+        # 单次启动转换和常驻进程各用一个配置目录，互不加锁
+        self._profile_dir = tempfile.mkdtemp(prefix="efai_soffice_")
+        self._office_profile_dir = tempfile.mkdtemp(prefix="efai_soffice_listener_")
+        self._office = None
+        self._office_port = None
+        self._desktop = None
+        self._thread = threading.Thread(target=self._run, name="pdf_export", daemon=True)
+        self._thread.start()
+
+    def available(self) -> bool:
+        return self.soffice_path is not None
+
+    def warm(self) -> bool:
+        """是否通过常驻进程转换"""
+        return self.soffice_path is not None and (unoConvert is not None or self.office_python is not None)
+
+    def submit(self, docx_path: str, output_dir: str = None):
+        """加入转换队列
+
+        Args:
+            docx_path: 待转换的报告路径
+            output_dir: PDF输出目录，默认与报告同目录
+        """
+        if not self.available():
+            self.failed.emit(docx_path, "未找到 LibreOffice，无法导出PDF")
+            return
+        self._queue.put((docx_path, output_dir or os.path.dirname(docx_path)))
+
+    def submit_many(self, docx_paths, output_dir: str = None):
+        """批量加入转换队列"""
+        for docx_path in docx_paths:
+            self.submit(docx_path, output_dir)
+
+    def _collect_batch(self, first):
+        batch = [first]
+        while True:
+            try:
+                job = self._queue.get(timeout=self.batch_wait)
+            except queue.Empty:
+                return batch
+            if job is None:
+                self._queue.put(None)
+                return batch
+            batch.append(job)
+
+    def _run(self):
+        # 提前启动常驻进程，第一份报告也不用等 LibreOffice 初始化
+        if self.warm():
+            try:
+                self._ensure_office()
+            except Exception:
+                self._stop_office()
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            groups = {}
+            for docx_path, output_dir in self._collect_batch(job):
+                groups.setdefault(output_dir, []).append(docx_path)
+            for output_dir, docx_paths in groups.items():
+                # 一批出错（如输出目录不可达）只让这一批失败，转换线程继续处理后续任务
+                try:
+                    self._convert(docx_paths, output_dir)
+                except Exception as e:
+                    for docx_path in docx_paths:
+                        self.failed.emit(docx_path, str(e) or "PDF转换失败")
+
+    def _office_alive(self) -> bool:
+        return self._office is not None and self._office.poll() is None
+
+    def _ensure_office(self):
+        """常驻进程没有运行时启动它，进程内可用 uno 时同时建立连接"""
+        if not self._office_alive():
+            self._stop_office()
+            self._office_port = _free_port()
+            command = [
+                self.soffice_path,
+                "--headless", "--invisible", "--nologo", "--nodefault", "--norestore", "--nolockcheck",
+                f"-env:UserInstallation={_file_url(self._office_profile_dir)}",
+                f"--accept={ACCEPT_FORMAT.format(port=self._office_port)}",
+            ]
+            # 单独的进程组，结束时连同 soffice.bin 一起结束
+            options = ({"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt"
+                       else {"start_new_session": True})
+            self._office = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL, **options)
+        if unoConvert is not None and self._desktop is None:
+            self._desktop = unoConvert.connect(self._office_port, self.timeout)
+
+    def _stop_office(self):
+        office, self._office = self._office, None
+        desktop, self._desktop = self._desktop, None
+        if office is None:
+            return
+        if desktop is not None:
+            try:
+                desktop.terminate()
+                office.wait(timeout=5)
+                return
+            except Exception:
+                pass
+        _kill_tree(office)
+        try:
+            office.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def _convert_warm(self, docx_paths, output_dir):
+        """通过常驻进程转换，返回 {docx路径: 错误信息}"""
+        self._ensure_office()
+        # UNO 调用本身没有超时，超时后结束常驻进程，进行中的调用随之报错返回
+        watchdog = threading.Timer(self.timeout * len(docx_paths), _kill_tree, (self._office,))
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            if unoConvert is not None:
+                errors = {}
+                for docx_path in docx_paths:
+                    try:
+                        unoConvert.convert(self._desktop, docx_path, output_dir)
+                    except Exception as e:
+                        errors[docx_path] = str(e)
+                return errors
+            command = [self.office_python, UNO_CONVERT_SCRIPT, "--port", str(self._office_port),
+                       "--outdir", output_dir, "--timeout", str(self.timeout)] + list(docx_paths)
+            result = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout * len(docx_paths))
+            errors = dict.fromkeys(docx_paths, result.stderr.strip())
+            for line in result.stdout.splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                errors[record["source"]] = record.get("error")
+            return {docx_path: error for docx_path, error in errors.items() if error is not None}
+        finally:
+            watchdog.cancel()
+
+    def _convert_cold(self, docx_paths, output_dir):
+        """每批启动一次 soffice 转换，返回统一的错误信息"""
+        command = [
+            self.soffice_path,
+            "--headless", "--norestore", "--nolockcheck",
+            f"-env:UserInstallation={_file_url(self._profile_dir)}",
+            "--convert-to", "pdf",
+            "--outdir", output_dir,
+        ] + list(docx_paths)
+        try:
+            result = subprocess.run(command, capture_output=True, text=True,
+                                    timeout=self.timeout * len(docx_paths))
+            return result.stderr.strip()
+        except subprocess.TimeoutExpired:
+            return "PDF转换超时"
+        except OSError as e:
+            return str(e)
+
+    @staticmethod
+    def _pdf_path(docx_path, output_dir):
+        return os.path.join(output_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+
+    def _pdf_ready(self, docx_path, output_dir) -> bool:
+        pdf_path = self._pdf_path(docx_path, output_dir)
+        try:
+            return os.path.getmtime(pdf_path) >= os.path.getmtime(docx_path)
+        except OSError:
+            return False
+
+    @trace("pdf_export.convert")
+    def _convert(self, docx_paths, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        errors = {}
+        pending = list(docx_paths)
+        if self.warm():
+            try:
+                errors = self._convert_warm(pending, output_dir)
+            except Exception as e:
+                # 连接不上或通信出错，结束常驻进程，下一批重新拉起
+                errors = dict.fromkeys(pending, str(e))
+                self._stop_office()
+            # 文档本身有问题时常驻进程仍在运行，直接报告；进程已退出的改用单次启动转换
+            pending = [] if self._office_alive() else [p for p in pending if not self._pdf_ready(p, output_dir)]
+        if pending:
+            self._stop_office()
+            error = self._convert_cold(pending, output_dir)
+            errors.update(dict.fromkeys(pending, error))
+
+        for docx_path in docx_paths:
+            if self._pdf_ready(docx_path, output_dir):
+                self.converted.emit(docx_path, self._pdf_path(docx_path, output_dir))
+            else:
+                self.failed.emit(docx_path, errors.get(docx_path) or "PDF转换失败")
+
+    def shutdown(self):
+        """停止转换线程和常驻进程，清理临时配置目录"""
+        self._queue.put(None)
+        self._thread.join(timeout=1)
+        self._stop_office()
+        shutil.rmtree(self._profile_dir, ignore_errors=True)
+        shutil.rmtree(self._office_profile_dir, ignore_errors=True)
@@ -0,0 +1,266 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+
+# 跟踪日志记录器，未配置时只保留内存中的最近记录
+logger = logging.getLogger("efai.trace")
+logger.propagate = False
+
+# 最近完成的跨度，供诊断页面等读取
+recent_spans = deque(maxlen=500)
+
+_local = threading.local()
+# 线程ID -> 跨度名称栈，供其他线程（如卡顿监测）读取
+_stacks = {}
+_chrome_lock = threading.Lock()
+_chrome_file = None
+_enabled = True
+_listeners = []
+
+
+def user_data_dir(*parts: str) -> str:
+    """当前用户的程序数据目录：Windows 下为 %LOCALAPPDATA%\\EFAI，其他系统为 ~/.efai"""
+    base = os.environ.get("LOCALAPPDATA")
+    root = os.path.join(base, "EFAI") if base else os.path.join(os.path.expanduser("~"), ".efai")
+    return os.path.join(root, *parts)
+
+
+def user_log_dir() -> str:
+    """当前用户的日志目录"""
+    return user_data_dir("logs")
+
+
+def resolve_log_dir(preferred: str):
+    """返回可写的日志目录
+
+    程序安装在只读目录（如 Program Files）时 preferred 无法创建或写入，
+    改用当前用户的日志目录；都不可写时返回 None，调用方不再写日志文件。
+    """
+    for path in (preferred, user_log_dir()):
+        try:
+            os.makedirs(path, exist_ok=True)
+            probe = os.path.join(path, f".write_test_{os.getpid()}")
+            with open(probe, "w"):
+                pass
+            os.remove(probe)
+            return path
+        except OSError:
+            continue
+    return None
+
+
+def configure(log_dir: str, max_bytes: int = 5 * 1024 * 1024, backup_count: int = 5, chrome: bool = False):
+    """配置跟踪输出，日志目录不可写时只保留内存中的最近记录
+
+    Args:
+        log_dir: 日志目录
+        max_bytes: 单个 JSON 行日志文件的最大字节数，超过后轮转
+        backup_count: 保留的轮转文件数量
+        chrome: 是否同时输出 Chrome trace 格式（chrome://tracing 或 Perfetto 打开）
+
+    Returns:
+        bool: 是否已写入日志文件
+    """
+    global _chrome_file
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        handler = RotatingFileHandler(os.path.join(log_dir, "trace.jsonl"), maxBytes=max_bytes,
+                                      backupCount=backup_count, encoding="utf-8")
+    except OSError as e:
+        print(f"无法写入跟踪日志 {log_dir}: {e}")
+        return False
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    if chrome:
+        path = os.path.join(log_dir, f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            # Chrome trace 的 JSON 数组允许省略结尾的 ]，异常退出时文件依然可用
+            _chrome_file = open(path, "w", encoding="utf-8")
+            _chrome_file.write("[\n")
+            _chrome_file.flush()
+        except OSError as e:
+            print(f"无法写入 Chrome trace {path}: {e}")
+            _chrome_file = None
+    return True
+
+
+def set_enabled(enabled: bool):
+    global _enabled
+    _enabled = enabled
+
+
+def add_listener(callback):
+    """注册跨度完成回调，回调参数为跨度字典，可能在工作线程中调用"""
+    _listeners.append(callback)
+
+
+def current_action(thread_id: int = None):
+    """返回线程最外层的跨度名称，没有时返回 None
+
+    Args:
+        thread_id: 线程ID，默认为当前线程
+    """
+    if thread_id is None:
+        stack = getattr(_local, "stack", None)
+    else:
+        stack = _stacks.get(thread_id)
+    return stack[0] if stack else None
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+        _stacks[threading.get_ident()] = stack
+    return stack
+
+
+class Span:
+    """跟踪跨度，作为上下文管理器使用"""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+
+    def __enter__(self):
+        _stack().append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        stack = _stack()
+        stack.pop()
+        if _enabled:
+            self._emit(parent=stack[-1] if stack else None, error=exc_type.__name__ if exc_type else None)
+        return False
+
+    def _emit(self, parent, error):
+        thread = threading.current_thread()
+        record = {
+            "ts": time.time() - self.duration,
+            "name": self.name,
+            "duration_ms": round(self.duration * 1000, 3),
+            "thread": thread.name,
+        }
+        if parent:
+            record["parent"] = parent
+        if error:
+            record["error"] = error
+        if self.attrs:
+            record["attrs"] = self.attrs
+        recent_spans.append(record)
+        if logger.handlers:
+            logger.info(json.dumps(record, ensure_ascii=False, default=str))
+        if _chrome_file is not None:
+            event = {
+                "name": self.name, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+                "ts": int(record["ts"] * 1e6), "dur": int(self.duration * 1e6),
+                "args": self.attrs,
+            }
+            with _chrome_lock:
+                _chrome_file.write(json.dumps(event, ensure_ascii=False, default=str) + ",\n")
+                _chrome_file.flush()
+        for callback in _listeners:
+            try:
+                callback(record)
+            except Exception:
+                pass
+
+
+def _positional_limit(func):
+    """函数可接收的最多位置参数个数，接收 *args 时返回 None"""
+    parameters = inspect.signature(func).parameters.values()
+    if any(p.kind == p.VAR_POSITIONAL for p in parameters):
+        return None
+    return sum(1 for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+
+def trace(name: str = None, **attrs):
+    """跟踪装饰器/上下文管理器
+
+    用法：
+        @trace("sku_clicked")
+        def sku_clicked(self, item): ...
+
+        with trace("report.save"):
+            doc.save(path)
+
+    装饰的方法作为Qt槽函数连接时，多出的信号参数（如 clicked 的 checked）
+    会像Qt本身一样被丢弃，不会传给被装饰的方法。
+    """
+    if callable(name):
+        return trace()(name)
+
+    class _Trace:
+        def __enter__(self):
+            self._span = Span(name or "anonymous", **attrs)
+            return self._span.__enter__()
+
+        def __exit__(self, exc_type, exc, tb):
+            return self._span.__exit__(exc_type, exc, tb)
+
+        def __call__(self, func):
+            return _traced(func, name or func.__qualname__, attrs, drop_extra_args=True)
+
+    return _Trace()
+
+
+def _traced(func, span_name: str, attrs: dict, drop_extra_args: bool):
+    """包装函数，调用时记录跨度
+
+    Args:
+        drop_extra_args: 是否像Qt槽函数一样丢弃多出的位置参数
+    """
+    limit = _positional_limit(func) if drop_extra_args else None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if limit is not None:
+            args = args[:limit]
+        with Span(span_name, **attrs):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def trace_methods(obj, prefix: str, names=None):
+    """给对象实例的公共方法加上跟踪，用于无法修改源码的类（如数据库管理器）
+
+    这些方法不作为Qt槽函数连接，参数原样传递，多传的参数照常报错。
+
+    Args:
+        obj: 对象实例
+        prefix: 跨度名称前缀
+        names: 需要跟踪的方法名列表，默认为所有公共方法
+    """
+    if names is None:
+        names = [n for n in dir(obj) if not n.startswith("_") and inspect.ismethod(getattr(obj, n, None))]
+    for method_name in names:
+        method = getattr(obj, method_name)
+        setattr(obj, method_name, _traced(method, f"{prefix}.{method_name}", {}, drop_extra_args=False))
+    return obj
+
+
+def shutdown():
+    """关闭跟踪输出文件"""
+    global _chrome_file
+    if _chrome_file is not None:
+        with _chrome_lock:
+            _chrome_file.close()
+            _chrome_file = None
+    for handler in list(logger.handlers):
+        handler.close()
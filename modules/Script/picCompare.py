@@ -0,0 +1,218 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtGui import QImage
+
+from modules.Script.dbService import create_database_manager
+from modules.Script.imageCache import image_cache
+from modules.Script.perfTrace import trace
+
+
+# 哈希边长：dHash 取 9x8 灰度图，aHash 取 8x8 灰度图，各得到 64 位
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+# 计算特征前先把图片解码到不超过该边长
+FEATURE_DECODE_SIZE = 256
+
+
+def _gray_pixels(image: QImage, width: int, height: int) -> np.ndarray:
+    """把图片缩放为指定大小的灰度矩阵"""
+    small = image.scaled(width, height,
+                         Qt.AspectRatioMode.IgnoreAspectRatio,
+                         Qt.TransformationMode.SmoothTransformation)
+    small = small.convertToFormat(QImage.Format.Format_Grayscale8)
+    # 每行按4字节对齐，需要按bytesPerLine切片
+    buffer = np.frombuffer(small.constBits(), dtype=np.uint8, count=small.sizeInBytes())
+    return buffer.reshape(height, small.bytesPerLine())[:, :width].astype(np.int16)
+
+
+def compute_features(image_path: str):
+    """计算单张图片的感知哈希特征
+
+    Args:
+        image_path: 图片路径
+
+    Returns:
+        np.ndarray: 形如 (2,) 的 uint64 数组 [dHash, aHash]，读取失败返回 None
+    """
+    # 哈希只需要小图，按较小尺寸解码并放入共享缓存
+    image = image_cache.image(image_path, (FEATURE_DECODE_SIZE, FEATURE_DECODE_SIZE))
+    if image.isNull():
+        return None
+
+    # dHash：相邻像素的明暗梯度
+    pixels = _gray_pixels(image, HASH_SIZE + 1, HASH_SIZE)
+    d_bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    # aHash：与均值的比较
+    pixels = _gray_pixels(image, HASH_SIZE, HASH_SIZE)
+    a_bits = (pixels > pixels.mean()).flatten()
+
+    weights = np.uint64(1) << np.arange(HASH_BITS, dtype=np.uint64)
+    d_hash = np.bitwise_or.reduce(weights[d_bits]) if d_bits.any() else np.uint64(0)
+    a_hash = np.bitwise_or.reduce(weights[a_bits]) if a_bits.any() else np.uint64(0)
+    return np.array([d_hash, a_hash], dtype=np.uint64)
+
+
+def hamming_distances(features: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """计算一组特征与特征矩阵每一行的汉明距离（向量化）
+
+    Args:
+        features: 形如 (2,) 的 uint64 数组
+        matrix: 形如 (N, 2) 的 uint64 数组
+
+    Returns:
+        np.ndarray: 形如 (N,) 的距离，dHash 与 aHash 距离之和的一半
+    """
+    xor = np.bitwise_xor(matrix, features)
+    bits = np.unpackbits(xor.view(np.uint8), axis=1)
+    return bits.reshape(len(matrix), -1).sum(axis=1) / 2.0
+
+
+class PicCompareEngine(QObject):
+    """拍照比对引擎：实物照片与图纸的本地自动比对
+
+    图纸特征按 (路径, 修改时间) 缓存，只计算一次；比对在后台线程池中执行，
+    结果通过 compared 信号返回给界面线程。
+    """
+
+    # 照片路径, 排序后的匹配结果列表
+    compared = Signal(str, list)
+    # sku, 准备好的图纸数量
+    prepared = Signal(str, int)
+
+    def __init__(self, max_workers: int = 2, index=None, parent=None):
+        super().__init__(parent)
+        # 持久化的图纸特征索引（DrawingIndex），为空时只使用内存缓存
+        self.index = index
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="pic_compare")
+        self._lock = threading.Lock()
+        # (path, mtime) -> features
+        self._feature_cache = {}
+        # sku -> 图纸信息列表
+        self._drawing_cache = {}
+
+    def drawing_features(self, image_path: str, sku: str = None):
+        """获取图纸特征，依次查找内存缓存、持久化索引，都未命中时重新计算"""
+        try:
+            key = (image_path, os.path.getmtime(image_path))
+        except OSError:
+            return None
+        with self._lock:
+            if key in self._feature_cache:
+                return self._feature_cache[key]
+        features = self.index.get(image_path, sku) if self.index is not None else None
+        if features is None:
+            features = compute_features(image_path)
+            if self.index is not None and sku is not None:
+                self.index.put(sku, image_path, features)
+        with self._lock:
+            self._feature_cache[key] = features
+        return features
+
+    def _load_drawings(self, sku: str):
+        """读取并缓存SKU的图纸信息"""
+        with self._lock:
+            if sku in self._drawing_cache:
+                return self._drawing_cache[sku]
+        # 工作线程里单独创建数据库管理器，不与界面线程共享连接
+        drawings = create_database_manager().get_drawing_info_by_sku(sku)
+        with self._lock:
+            self._drawing_cache[sku] = drawings
+        return drawings
+
+    def _prepare(self, sku: str):
+        drawings = self._load_drawings(sku)
+        count = 0
+        for info in drawings:
+            if self.drawing_features(info["drawing_path"], sku) is not None:
+                count += 1
+        if self.index is not None:
+            self.index.prune(sku, [info["drawing_path"] for info in drawings])
+        self.prepared.emit(sku, count)
+        return count
+
+    def prepare(self, sku: str):
+        """后台预先计算SKU所有图纸的特征"""
+        return self._executor.submit(self._prepare, sku)
+
+    def rebuild(self, sku: str):
+        """图纸重新下载或上传后，刷新SKU的图纸信息并在后台重建索引"""
+        self.invalidate(sku)
+        return self.prepare(sku)
+
+    def invalidate(self, sku: str = None):
+        """清除图纸信息缓存，图纸重新上传后调用"""
+        with self._lock:
+            if sku is None:
+                self._drawing_cache.clear()
+            else:
+                self._drawing_cache.pop(sku, None)
+
+    @trace("pic_compare.compare")
+    def compare(self, sku: str, photo_path: str) -> list:
+        """同步比对照片与SKU的所有图纸
+
+        Args:
+            sku: SKU编号
+            photo_path: 照片路径
+
+        Returns:
+            list: 按置信度降序的匹配结果，每项包含 drawing_path、word_part、
+                  part_number、distance、confidence
+        """
+        photo = compute_features(photo_path)
+        if photo is None:
+            return []
+
+        drawings = self._load_drawings(sku)
+        indexed = {}
+        if self.index is not None:
+            # 一次读出SKU的全部特征矩阵，不再逐张图纸查询索引；索引中没有的再单独计算
+            paths, matrix = self.index.sku_matrix(sku)
+            indexed = dict(zip(paths, matrix))
+        candidates = []
+        rows = []
+        for info in drawings:
+            features = indexed.get(info["drawing_path"])
+            if features is None:
+                features = self.drawing_features(info["drawing_path"], sku)
+            if features is not None:
+                candidates.append(info)
+                rows.append(features)
+        if not rows:
+            return []
+
+        distances = hamming_distances(photo, np.vstack(rows))
+        order = np.argsort(distances, kind="stable")
+        results = []
+        for index in order:
+            info = candidates[index]
+            results.append({
+                "drawing_path": info["drawing_path"],
+                "word_part": info.get("word_part", ""),
+                "part_number": info.get("part_number", ""),
+                "distance": float(distances[index]),
+                "confidence": round(1.0 - float(distances[index]) / HASH_BITS, 3),
+            })
+        return results
+
+    def _compare(self, sku: str, photo_path: str):
+        try:
+            results = self.compare(sku, photo_path)
+        except Exception as e:
+            print(f"拍照比对失败: {e}")
+            results = []
+        self.compared.emit(photo_path, results)
+        return results
+
+    def compare_async(self, sku: str, photo_path: str):
+        """在后台线程池中比对照片，结果通过 compared 信号返回"""
+        return self._executor.submit(self._compare, sku, photo_path)
+
+    def shutdown(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
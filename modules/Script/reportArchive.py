@@ -0,0 +1,195 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+# 归档包中的清单文件名
+MANIFEST_NAME = "manifest.json"
+
+
+class ReportArchive:
+    """报告归档：每次生成的报告连同输入清单压缩保存，按 SKU/日期/版本 建立索引
+
+    报告目录下的 <sku>.docx 仍是最新的报告，归档在 archive/<sku>/ 下按版本保存
+    zip 包（报告 + manifest.json），索引保存在 archive/archive.db。清理策略
+    按SKU保留最近 keep_versions 个版本，并删除超过 keep_days 天的旧版本，
+    每个SKU的最新版本始终保留。
+    """
+
+    def __init__(self, root: str, keep_versions: int = 10, keep_days: int = 0):
+        self.root = root
+        self.index_path = os.path.join(root, "archive.db")
+        self.keep_versions = keep_versions
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS report_archive (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sku TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    fai_date TEXT,
+                    sn TEXT,
+                    created_at TEXT NOT NULL,
+                    archive_path TEXT NOT NULL,
+                    report_name TEXT NOT NULL,
+                    original_size INTEGER NOT NULL,
+                    compressed_size INTEGER NOT NULL,
+                    UNIQUE (sku, version)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_report_archive_created ON report_archive (created_at)")
+
+    @contextmanager
+    def _connect(self):
+        """打开连接，退出时提交并关闭"""
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def archive(self, sku: str, report_path: str, manifest: dict) -> int:
+        """归档一份报告
+
+        Args:
+            sku: SKU
+            report_path: 生成的报告路径
+            manifest: 生成报告的输入（机种、SN、日期、references、模板等）
+
+        Returns:
+            int: 归档的版本号
+        """
+        created_at = datetime.now()
+        manifest = dict(manifest, sku=sku, station=socket.gethostname(),
+                        generated_at=created_at.isoformat(timespec="seconds"))
+        sku_dir = os.path.join(self.root, sku)
+        os.makedirs(sku_dir, exist_ok=True)
+
+        # 版本号分配、写包和登记在同一个写事务内，多个工位同时归档也不会重复
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM report_archive WHERE sku = ?",
+                                   (sku,)).fetchone()[0]
+            manifest["version"] = version
+            archive_path = os.path.join(sku_dir, f"{sku}_v{version}_{created_at:%Y%m%d%H%M%S}.zip")
+            temp_path = archive_path + ".tmp"
+            try:
+                with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+                    zf.write(report_path, os.path.basename(report_path))
+                    zf.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2, default=str))
+                os.replace(temp_path, archive_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            conn.execute("""
+                INSERT INTO report_archive (sku, version, fai_date, sn, created_at, archive_path,
+                                            report_name, original_size, compressed_size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (sku, version, manifest.get("fai_date"), manifest.get("sn"),
+                  created_at.isoformat(timespec="seconds"), os.path.relpath(archive_path, self.root),
+                  os.path.basename(report_path), os.path.getsize(report_path), os.path.getsize(archive_path)))
+        return version
+
+    def versions(self, sku: str):
+        """某个SKU的全部归档版本，新版本在前"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM report_archive WHERE sku = ? ORDER BY version DESC", (sku,))
+            return [dict(row) for row in rows]
+
+    def latest(self, sku: str):
+        """某个SKU的最新归档版本，没有返回 None"""
+        versions = self.versions(sku)
+        return versions[0] if versions else None
+
+    def find(self, sku: str = None, date_from: str = None, date_to: str = None, limit: int = 200):
+        """按SKU（前缀匹配）和归档日期范围查找，新的在前
+
+        Args:
+            sku: SKU前缀，为空时不限
+            date_from: 起始日期 YYYY-MM-DD，包含
+            date_to: 结束日期 YYYY-MM-DD，包含
+            limit: 最多返回条数
+        """
+        conditions, params = [], []
+        if sku:
+            conditions.append("sku >= ? AND sku < ?")
+            params += [sku, sku + "\U0010ffff"]
+        if date_from:
+            conditions.append("created_at >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("created_at < ?")
+            params.append((datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d"))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT * FROM report_archive {where} ORDER BY created_at DESC LIMIT ?",
+                                params + [limit])
+            return [dict(row) for row in rows]
+
+    def manifest(self, sku: str, version: int):
+        """读取某个版本的输入清单"""
+        with zipfile.ZipFile(self._archive_path(sku, version)) as zf:
+            return json.loads(zf.read(MANIFEST_NAME))
+
+    def extract(self, sku: str, version: int, output_dir: str) -> str:
+        """把某个版本的报告解压到目录，返回报告路径"""
+        record = self._record(sku, version)
+        with zipfile.ZipFile(os.path.join(self.root, record["archive_path"])) as zf:
+            return zf.extract(record["report_name"], output_dir)
+
+    def _record(self, sku: str, version: int):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM report_archive WHERE sku = ? AND version = ?",
+                               (sku, version)).fetchone()
+        if row is None:
+            raise KeyError(f"没有归档的报告: {sku} v{version}")
+        return dict(row)
+
+    def _archive_path(self, sku: str, version: int) -> str:
+        return os.path.join(self.root, self._record(sku, version)["archive_path"])
+
+    def prune(self, sku: str = None):
+        """按清理策略删除旧版本，sku为空时清理全部SKU
+
+        Returns:
+            int: 删除的版本数
+        """
+        cutoff = None
+        if self.keep_days:
+            cutoff = (datetime.now() - timedelta(days=self.keep_days)).isoformat(timespec="seconds")
+        with self._lock, self._connect() as conn:
+            # 每个SKU按版本从新到旧编号，第一个（最新版本）始终保留
+            rows = conn.execute("""
+                SELECT id, archive_path, created_at,
+                       ROW_NUMBER() OVER (PARTITION BY sku ORDER BY version DESC) AS rank
+                FROM report_archive
+                WHERE (? IS NULL OR sku = ?)
+            """, (sku, sku)).fetchall()
+            expired = [row for row in rows if row["rank"] > 1 and (
+                (self.keep_versions and row["rank"] > self.keep_versions)
+                or (cutoff and row["created_at"] < cutoff))]
+            for row in expired:
+                try:
+                    os.remove(os.path.join(self.root, row["archive_path"]))
+                except FileNotFoundError:
+                    pass
+                conn.execute("DELETE FROM report_archive WHERE id = ?", (row["id"],))
+        return len(expired)
+
+    def describe(self) -> str:
+        """诊断页面显示用的摘要"""
+        with self._connect() as conn:
+            count, original, compressed = conn.execute("""
+                SELECT COUNT(*), COALESCE(SUM(original_size), 0), COALESCE(SUM(compressed_size), 0)
+                FROM report_archive
+            """).fetchone()
+        return f"{count} 个版本，{compressed / 1024 / 1024:.1f} MB（原始 {original / 1024 / 1024:.1f} MB）"
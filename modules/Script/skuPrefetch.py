@@ -0,0 +1,161 @@
+import threading
+import time
+
+from PySide6.QtCore import QRunnable, QThread, QThreadPool
+
+from modules.Script.dbService import create_database_manager
+from modules.Script.imageCache import image_cache
+from modules.Script.perfTrace import trace
+
+
+class PrefetchStore:
+    """预取结果暂存
+
+    后台预取的数据按 (sku, 类型) 保存，前台读取时取走（只使用一次），
+    下次点击同一个SKU时重新查询，不会长期使用旧数据；超过 max_age 秒的数据直接丢弃。
+    每次丢弃都会增加对应的版本号，开始查询前记下版本号，查询期间数据被丢弃过
+    （如流程状态刚被修改）时，查询结果不再保存。
+    """
+
+    def __init__(self, max_age: float = 60.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # (sku, kind) -> (time, value)
+        self._items = {}
+        # 丢弃次数：clear 全部、按SKU丢弃全部类型、按 (sku, kind) 丢弃
+        self._cleared = 0
+        self._sku_versions = {}
+        self._versions = {}
+
+    def version(self, sku, kind: str):
+        """开始查询前调用，返回值传给 put"""
+        with self._lock:
+            return self._version(sku, kind)
+
+    def _version(self, sku, kind):
+        return self._cleared, self._sku_versions.get(sku, 0), self._versions.get((sku, kind), 0)
+
+    def put(self, sku, kind: str, value, version=None) -> bool:
+        """保存预取的数据；version 与当前版本不一致（查询期间被丢弃过）时不保存
+
+        Returns:
+            bool: 是否已保存
+        """
+        with self._lock:
+            if version is not None and version != self._version(sku, kind):
+                return False
+            self._items[(sku, kind)] = (time.monotonic(), value)
+            return True
+
+    def has(self, sku, kind: str) -> bool:
+        with self._lock:
+            item = self._items.get((sku, kind))
+        return item is not None and time.monotonic() - item[0] <= self.max_age
+
+    def take(self, sku, kind: str, loader):
+        """取出预取的数据，没有或已过期时调用 loader 查询"""
+        with self._lock:
+            item = self._items.pop((sku, kind), None)
+        if item is not None and time.monotonic() - item[0] <= self.max_age:
+            return item[1]
+        return loader()
+
+    def discard(self, sku, kind: str = None):
+        """丢弃某个SKU预取的数据，kind为空时丢弃该SKU的全部类型；流程状态的sku为None"""
+        with self._lock:
+            if kind is None:
+                self._sku_versions[sku] = self._sku_versions.get(sku, 0) + 1
+            else:
+                self._versions[(sku, kind)] = self._versions.get((sku, kind), 0) + 1
+            for key in [key for key in self._items if key[0] == sku and kind in (None, key[1])]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._cleared += 1
+            self._items.clear()
+
+
+# 预取结果，画廊和主窗口读取数据时先从这里取
+prefetch_store = PrefetchStore()
+
+
+class _PrefetchTask(QRunnable):
+    def __init__(self, prefetcher, generation: int, skus):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.generation = generation
+        self.skus = skus
+
+    def run(self):
+        try:
+            self.prefetcher._run(self.generation, self.skus)
+        except Exception as e:
+            print(f"预取SKU数据失败: {e}")
+
+
+class SkuPrefetcher:
+    """预取接下来几个SKU的数据：流程状态、图纸信息、实物图片信息、缩略图和references
+
+    使用单线程、最低优先级的独立线程池，不与前台操作争抢；每次选择新的SKU时
+    之前未完成的预取会被取消（在每一步之间检查代数）。
+    """
+
+    def __init__(self, thumbnail_size, store: PrefetchStore = prefetch_store):
+        # 根据图片数量计算缩略图边长的函数，与画廊保持一致
+        self.thumbnail_size = thumbnail_size
+        self.store = store
+        self._generation = 0
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(1)
+        self._pool.setThreadPriority(QThread.Priority.LowestPriority)
+
+    def schedule(self, skus):
+        """取消进行中的预取，开始预取新的SKU列表"""
+        self._generation += 1
+        self._pool.clear()
+        if skus:
+            self._pool.start(_PrefetchTask(self, self._generation, list(skus)))
+
+    def cancel(self):
+        self._generation += 1
+        self._pool.clear()
+
+    def _cancelled(self, generation: int) -> bool:
+        return generation != self._generation
+
+    @trace("prefetch")
+    def _run(self, generation: int, skus):
+        # 工作线程里单独创建数据库管理器
+        db_manager = create_database_manager()
+        if self._cancelled(generation):
+            return
+        if not self.store.has(None, "flow_status"):
+            version = self.store.version(None, "flow_status")
+            self.store.put(None, "flow_status", db_manager.select_skuDic_list(), version)
+
+        for sku in skus:
+            steps = [
+                ("drawings", db_manager.get_drawing_info_by_sku, "drawing_path"),
+                ("real_images", db_manager.get_part_real_images_by_sku, "image_path"),
+            ]
+            for kind, loader, path_key in steps:
+                if self._cancelled(generation):
+                    return
+                version = self.store.version(sku, kind)
+                infos = loader(sku)
+                self.store.put(sku, kind, infos, version)
+                if infos:
+                    size = self.thumbnail_size(len(infos))
+                    for info in infos:
+                        if self._cancelled(generation):
+                            return
+                        image_cache.image(info[path_key], (size, size))
+            if self._cancelled(generation):
+                return
+            version = self.store.version(sku, "references")
+            self.store.put(sku, "references", db_manager.get_references_by_sku(sku), version)
+
+    def shutdown(self):
+        self.cancel()
+        self._pool.waitForDone(1000)
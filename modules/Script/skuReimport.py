@@ -0,0 +1,90 @@
+import sqlite3
+
+
+def _ident(name: str) -> str:
+    """SQL标识符"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SkuSnapshot:
+    """SKU相关数据的快照：保存每张带 sku 列的表中该SKU的行，失败时原样恢复
+
+    数据库管理器的每个方法各自提交事务，删除旧数据和导入新数据无法放在同一个
+    事务里；先拍快照，导入失败时在一个事务里把这些表恢复到快照时的状态。
+    恢复只重写内容有变化的表，其他工位同时修改的无关表不受影响。
+    """
+
+    def __init__(self, db_path: str, sku: str):
+        self.db_path = db_path
+        self.sku = sku
+        # 表名 -> (sku列名, 列名列表, 行列表)
+        self.tables = {}
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            for table, sku_column, columns in self._sku_tables(conn):
+                self.tables[table] = (sku_column, columns, self._rows(conn, table, sku_column, columns))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _sku_tables(conn):
+        names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                 if not row[0].startswith(("sqlite_", "_replica_"))]
+        for table in names:
+            info = conn.execute(f"PRAGMA table_info({_ident(table)})").fetchall()
+            sku_columns = [row[1] for row in info if row[1].lower() == "sku"]
+            if not sku_columns:
+                continue
+            columns = [row[1] for row in info]
+            pk_rows = [row for row in info if row[5]]
+            # 没有 INTEGER PRIMARY KEY 时连同rowid一起保存，恢复后rowid不变
+            if not (len(pk_rows) == 1 and pk_rows[0][2].upper() == "INTEGER"):
+                columns = ["rowid"] + columns
+            yield table, sku_columns[0], columns
+
+    def _rows(self, conn, table, sku_column, columns):
+        column_list = ", ".join(column if column == "rowid" else _ident(column) for column in columns)
+        return sorted(conn.execute(f"SELECT {column_list} FROM {_ident(table)} WHERE {_ident(sku_column)} = ?",
+                                   (self.sku,)).fetchall(), key=repr)
+
+    def restore(self):
+        """把有变化的表恢复到快照时的状态，在一个事务里完成"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table, (sku_column, columns, rows) in self.tables.items():
+                    if self._rows(conn, table, sku_column, columns) == rows:
+                        continue
+                    column_list = ", ".join(column if column == "rowid" else _ident(column) for column in columns)
+                    conn.execute(f"DELETE FROM {_ident(table)} WHERE {_ident(sku_column)} = ?", (self.sku,))
+                    conn.executemany(f"INSERT INTO {_ident(table)} ({column_list}) "
+                                     f"VALUES ({', '.join('?' * len(columns))})", rows)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+
+def reimport_drawing(db_manager, db_path: str, sku: str, file_path: str):
+    """重新导入SKU的图纸表：删除原有的图纸和图片数据后导入新的Excel
+
+    导入失败（返回False或抛出异常）时把该SKU的数据恢复到删除前的状态，
+    不会留下旧数据已删除、新数据没导入的半截状态。
+
+    Returns:
+        导入方法的返回值
+    """
+    snapshot = SkuSnapshot(db_path, sku)
+    try:
+        db_manager.delete_data_by_sku(sku)
+        db_manager.delete_pic_by_sku(sku)
+        result = db_manager.import_excel_to_drawing(db_path, sku, file_path)
+    except Exception:
+        snapshot.restore()
+        raise
+    if not result:
+        snapshot.restore()
+    return result
@@ -0,0 +1,227 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+# 慢查询阈值（毫秒）
+SLOW_QUERY_MS = 100
+
+_lock = threading.Lock()
+# 规范化语句 -> 统计信息
+_stats = {}
+# 已经输出过执行计划的语句
+_explained = set()
+_log_dir = None
+_slow_ms = SLOW_QUERY_MS
+_original_connect = sqlite3.connect
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(sql: str) -> str:
+    """规范化SQL语句：字面量替换为?，合并空白，IN列表折叠"""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("(?...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def _record(sql: str, seconds: float, rows: int, calls: int = 1, duration: float = None):
+    """累加统计：seconds 计入总耗时，duration（默认同 seconds）是一次执行的完整耗时，用于最大值"""
+    key = normalize(sql)
+    duration = seconds if duration is None else duration
+    with _lock:
+        item = _stats.get(key)
+        if item is None:
+            item = _stats[key] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0}
+        item["calls"] += calls
+        item["total_ms"] += seconds * 1000
+        item["max_ms"] = max(item["max_ms"], duration * 1000)
+        item["rows"] += max(rows, 0)
+    return key
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """记录执行和取数耗时的游标
+
+    execute 返回时立即记录一次调用和执行耗时；之后取数的耗时和行数在结果取完、
+    游标再次执行、关闭或被回收时补记，只取一行就不再使用的查询也会被统计。
+    """
+
+    _sql = None
+    _params = ()
+    _execute_elapsed = 0.0
+    _fetch_elapsed = 0.0
+    _rows = 0
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql, self._params = sql, parameters
+            self._execute_elapsed = time.perf_counter() - start
+            self._fetch_elapsed = 0.0
+            self._rows = self.rowcount if self.rowcount > 0 else 0
+            _record(sql, self._execute_elapsed, 0)
+            if not sql.lstrip().upper().startswith(("SELECT", "WITH", "PRAGMA")):
+                self._finish()
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        seq_of_parameters = list(seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            key = _record(sql, elapsed, self.rowcount, calls=len(seq_of_parameters))
+            # 批量写入（如导入图纸表）按整批耗时检查，执行计划用第一组参数
+            if elapsed * 1000 >= _slow_ms:
+                _log_slow(self.connection, key, sql, seq_of_parameters[0] if seq_of_parameters else (),
+                          elapsed, self.rowcount)
+
+    def _timed_fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        self._fetch_elapsed += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._timed_fetch(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed_fetch(super().fetchmany, size if size is not None else self.arraysize)
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed_fetch(super().fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._finish()
+            raise
+        finally:
+            self._fetch_elapsed += time.perf_counter() - start
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _finish(self):
+        """语句结束，补记取数耗时和行数，并检查慢查询"""
+        if self._sql is None:
+            return
+        sql, params, rows = self._sql, self._params, self._rows
+        elapsed = self._execute_elapsed + self._fetch_elapsed
+        self._sql = None
+        key = _record(sql, self._fetch_elapsed, rows, calls=0, duration=elapsed)
+        if elapsed * 1000 >= _slow_ms:
+            _log_slow(self.connection, key, sql, params, elapsed, rows)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """游标默认使用 ProfiledCursor 的连接"""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _log_slow(connection, key, sql, params, elapsed, rows):
+    if _log_dir is None:
+        return
+    entry = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "duration_ms": round(elapsed * 1000, 3),
+        "rows": rows,
+        "statement": key,
+    }
+    with _lock:
+        explain = key not in _explained
+        _explained.add(key)
+    if explain and sql.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")):
+        try:
+            plan = connection.cursor(sqlite3.Cursor).execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            entry["query_plan"] = [row[-1] for row in plan]
+        except sqlite3.Error as e:
+            entry["query_plan_error"] = str(e)
+    with _lock, open(os.path.join(_log_dir, "slow_query.log"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def _profiled_connect(*args, **kwargs):
+    kwargs.setdefault("factory", ProfiledConnection)
+    return _original_connect(*args, **kwargs)
+
+
+def install(log_dir: str, slow_ms: float = SLOW_QUERY_MS):
+    """开启SQL分析：之后通过 sqlite3.connect 创建的连接都会被记录
+
+    Args:
+        log_dir: 慢查询日志和统计报告的目录
+        slow_ms: 慢查询阈值（毫秒）
+    """
+    global _log_dir, _slow_ms
+    os.makedirs(log_dir, exist_ok=True)
+    _log_dir = log_dir
+    _slow_ms = slow_ms
+    sqlite3.connect = _profiled_connect
+
+
+def installed() -> bool:
+    return sqlite3.connect is _profiled_connect
+
+
+def total_queries() -> int:
+    """已记录的语句执行次数"""
+    with _lock:
+        return sum(item["calls"] for item in _stats.values())
+
+
+def stats(limit: int = None):
+    """按总耗时降序返回各语句的统计信息"""
+    with _lock:
+        items = [dict(statement=key, **value) for key, value in _stats.items()]
+    items.sort(key=lambda item: item["total_ms"], reverse=True)
+    return items[:limit] if limit else items
+
+
+def write_report():
+    """把统计信息写到 sql_profile.json"""
+    if _log_dir is None:
+        return
+    with open(os.path.join(_log_dir, "sql_profile.json"), "w", encoding="utf-8") as f:
+        json.dump(stats(), f, ensure_ascii=False, indent=2)
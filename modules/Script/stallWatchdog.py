@@ -0,0 +1,89 @@
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+
+from PySide6.QtCore import QObject, QTimer
+
+from modules.Script import perfTrace
+
+
+logger = logging.getLogger("efai.stall")
+logger.propagate = False
+
+
+class StallWatchdog(QObject):
+    """界面线程卡顿监测
+
+    界面线程通过定时器不断更新心跳，监测线程发现心跳超过阈值没有更新时，
+    用 sys._current_frames 抓取界面线程当前的Python调用栈，连同正在执行的
+    操作名称一起写入日志。卡顿持续时每隔一个阈值再采样一次，最多 max_samples 次。
+    """
+
+    def __init__(self, log_dir: str, threshold: float = 1.0, heartbeat_ms: int = 100,
+                 max_samples: int = 5, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold
+        self.max_samples = max_samples
+        self._gui_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop = threading.Event()
+
+        # 日志目录为空或不可写时照常监测，只是不写日志文件
+        if log_dir and not logger.handlers:
+            try:
+                os.makedirs(log_dir, exist_ok=True)
+                handler = RotatingFileHandler(os.path.join(log_dir, "stall.log"), maxBytes=2 * 1024 * 1024,
+                                              backupCount=3, encoding="utf-8")
+            except OSError as e:
+                print(f"无法写入卡顿日志 {log_dir}: {e}")
+            else:
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+
+        # 心跳定时器必须在界面线程中创建
+        self._heartbeat = QTimer(self)
+        self._heartbeat.setInterval(heartbeat_ms)
+        self._heartbeat.timeout.connect(self._beat)
+        self._thread = threading.Thread(target=self._watch, name="stall_watchdog", daemon=True)
+
+    def start(self):
+        self._last_beat = time.monotonic()
+        self._heartbeat.start()
+        self._thread.start()
+
+    def stop(self):
+        self._heartbeat.stop()
+        self._stop.set()
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+
+    def _watch(self):
+        stalled_since = None
+        samples = 0
+        while not self._stop.wait(self.threshold / 4):
+            last_beat = self._last_beat
+            stalled = time.monotonic() - last_beat
+            if stalled < self.threshold:
+                if stalled_since is not None:
+                    logger.info(f"界面恢复响应，卡顿共 {time.monotonic() - stalled_since:.2f}s")
+                    stalled_since = None
+                continue
+            if stalled_since is None or stalled_since != last_beat:
+                stalled_since = last_beat
+                samples = 0
+            # 按阈值的整数倍采样
+            if samples < self.max_samples and stalled >= self.threshold * (samples + 1):
+                samples += 1
+                self._dump(stalled, samples)
+
+    def _dump(self, stalled: float, sample: int):
+        frame = sys._current_frames().get(self._gui_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "（无法获取调用栈）\n"
+        action = perfTrace.current_action(self._gui_thread_id) or "未知"
+        logger.warning(f"界面线程已 {stalled:.2f}s 无响应，操作: {action}，第 {sample} 次采样\n{stack}")
@@ -0,0 +1,93 @@
+"""通过常驻的 LibreOffice 进程把文档转换为PDF
+
+程序自身能导入 uno 时在进程内调用 connect/convert；否则用 LibreOffice 自带的
+Python 以脚本方式运行本文件（本文件不依赖程序的其他模块）：
+
+    python unoConvert.py --port 2002 --outdir D:/reports a.docx b.docx
+
+每个文档输出一行JSON：{"source": ..., "pdf": ...} 或 {"source": ..., "error": ...}
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import uno
+from com.sun.star.beans import PropertyValue
+from com.sun.star.connection import NoConnectException
+
+
+def accept_string(port: int) -> str:
+    """soffice --accept 使用的连接描述"""
+    return f"socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+
+
+def _property(name, value):
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+def connect(port: int, timeout: float = 60.0):
+    """连接监听中的 LibreOffice，返回 Desktop；进程刚启动时等待其开始监听"""
+    local_context = uno.getComponentContext()
+    resolver = local_context.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local_context)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            context = resolver.resolve(f"uno:{accept_string(port)}")
+            break
+        except NoConnectException:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+    return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+
+
+def convert(desktop, source: str, output_dir: str) -> str:
+    """把一个文档转换为PDF
+
+    Args:
+        desktop: connect 返回的 Desktop
+        source: 待转换的文档路径
+        output_dir: PDF输出目录
+
+    Returns:
+        str: PDF路径
+    """
+    pdf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(source))[0] + ".pdf")
+    document = desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(source)), "_blank", 0,
+                                            (_property("Hidden", True),))
+    if document is None:
+        raise RuntimeError(f"无法打开文档: {source}")
+    try:
+        document.storeToURL(uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                            (_property("FilterName", "writer_pdf_Export"),))
+    finally:
+        document.close(True)
+    return pdf_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通过常驻的 LibreOffice 转换PDF")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--outdir", required=True)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("sources", nargs="+")
+    args = parser.parse_args()
+
+    desktop = connect(args.port, args.timeout)
+    for source in args.sources:
+        try:
+            result = {"source": source, "pdf": convert(desktop, source, args.outdir)}
+        except Exception as e:
+            result = {"source": source, "error": str(e)}
+        print(json.dumps(result))
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
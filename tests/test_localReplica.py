@@ -0,0 +1,154 @@
+import os
+import sqlite3
+
+import pytest
+
+from modules.Script.localReplica import LocalReplica
+
+
+def rows(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def execute(path, *statements):
+    conn = sqlite3.connect(path)
+    try:
+        for statement in statements:
+            conn.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def central(tmp_path):
+    path = str(tmp_path / "central.db")
+    execute(path,
+            "CREATE TABLE flow (id INTEGER PRIMARY KEY, sku TEXT UNIQUE, bom_check TEXT, pic_download TEXT, img BLOB)",
+            "CREATE TABLE report (sku TEXT, path TEXT)",
+            "INSERT INTO flow (sku, bom_check, pic_download, img) VALUES ('A', '0', '0', x'0001')",
+            "INSERT INTO flow (sku, bom_check, pic_download) VALUES ('B', '0', '0')",
+            "INSERT INTO report VALUES ('A', 'a.docx')")
+    return path
+
+
+@pytest.fixture
+def replica(tmp_path, central):
+    replica = LocalReplica(central, str(tmp_path / "local" / "replica.db"), str(tmp_path / "logs"))
+    replica.prepare()
+    return replica
+
+
+def test_insert_update_delete_are_pushed(replica, central):
+    execute(replica.local_path,
+            "UPDATE flow SET bom_check = '1' WHERE sku = 'A'",
+            "INSERT INTO flow (sku, bom_check, pic_download) VALUES ('C', '0', '0')",
+            "INSERT INTO report VALUES ('C', 'c.docx')",
+            "DELETE FROM report WHERE sku = 'A'")
+
+    assert replica.sync_now() == (4, 0)
+    assert rows(central, "SELECT sku, bom_check, img FROM flow ORDER BY sku") == [
+        ("A", "1", b"\x00\x01"), ("B", "0", None), ("C", "0", None)]
+    assert rows(central, "SELECT sku, path FROM report") == [("C", "c.docx")]
+    assert replica.pending_changes() == 0
+    assert rows(replica.local_path, "SELECT sku FROM flow ORDER BY sku") == [("A",), ("B",), ("C",)]
+
+
+def test_local_insert_gets_central_rowid_for_later_updates(replica, central):
+    execute(replica.local_path, "INSERT INTO flow (sku, bom_check, pic_download) VALUES ('C', '0', '0')")
+    execute(central, "INSERT INTO flow (sku, bom_check, pic_download) VALUES ('D', '0', '0')")
+    replica.sync_now()
+    # 拉取后本地rowid与中心数据库一致，之后的修改落在同一行
+    execute(replica.local_path, "UPDATE flow SET bom_check = '1' WHERE sku = 'C'")
+    replica.sync_now()
+
+    assert rows(central, "SELECT sku, bom_check FROM flow WHERE sku IN ('C', 'D') ORDER BY sku") == [
+        ("C", "1"), ("D", "0")]
+
+
+def test_different_columns_of_same_row_are_merged(replica, central):
+    execute(replica.local_path, "UPDATE flow SET bom_check = '1' WHERE sku = 'A'")
+    execute(central, "UPDATE flow SET pic_download = '1' WHERE sku = 'A'")
+
+    assert replica.sync_now() == (1, 0)
+    assert rows(central, "SELECT bom_check, pic_download FROM flow WHERE sku = 'A'") == [("1", "1")]
+    assert rows(replica.local_path, "SELECT bom_check, pic_download FROM flow WHERE sku = 'A'") == [("1", "1")]
+
+
+def test_same_column_conflict_keeps_central_value(replica, central):
+    execute(replica.local_path, "UPDATE flow SET bom_check = 'local' WHERE sku = 'B'")
+    execute(central, "UPDATE flow SET bom_check = 'other' WHERE sku = 'B'")
+
+    assert replica.sync_now() == (1, 1)
+    assert rows(central, "SELECT bom_check FROM flow WHERE sku = 'B'") == [("other",)]
+    assert rows(replica.local_path, "SELECT bom_check FROM flow WHERE sku = 'B'") == [("other",)]
+    assert rows(replica.local_path, "SELECT tbl, op FROM _replica_conflicts") == [("flow", "UPDATE")]
+
+
+def test_delete_of_row_changed_elsewhere_is_a_conflict(replica, central):
+    execute(replica.local_path, "DELETE FROM flow WHERE sku = 'B'")
+    execute(central, "UPDATE flow SET pic_download = '1' WHERE sku = 'B'")
+
+    assert replica.sync_now() == (1, 1)
+    assert rows(central, "SELECT pic_download FROM flow WHERE sku = 'B'") == [("1",)]
+
+
+def test_changes_to_a_failed_insert_do_not_touch_other_rows(replica, central):
+    execute(central,
+            "INSERT INTO flow (sku, bom_check, pic_download) VALUES ('C', '0', '0')",
+            "INSERT INTO flow (sku, bom_check, pic_download) VALUES ('D', '0', '0')")
+    # 本地新增的D与中心数据库的D冲突，本地rowid正好是中心数据库里C的rowid
+    execute(replica.local_path,
+            "INSERT INTO flow (sku, bom_check, pic_download) VALUES ('D', '0', '0')",
+            "UPDATE flow SET bom_check = '1' WHERE sku = 'D'")
+
+    assert replica.sync_now() == (2, 2)
+    assert rows(central, "SELECT sku, bom_check FROM flow ORDER BY sku") == [
+        ("A", "0"), ("B", "0"), ("C", "0"), ("D", "0")]
+    assert rows(replica.local_path, "SELECT tbl, op FROM _replica_conflicts ORDER BY id") == [
+        ("flow", "INSERT"), ("flow", "UPDATE")]
+
+
+def test_changes_are_kept_while_offline(replica, central, tmp_path):
+    execute(replica.local_path, "UPDATE flow SET bom_check = '1' WHERE sku = 'A'")
+    replica.central_path = str(tmp_path / "missing" / "central.db")
+    with pytest.raises((sqlite3.Error, OSError)):
+        replica.sync_now()
+    assert replica.pending_changes() == 1
+
+    replica.central_path = central
+    assert replica.sync_now() == (1, 0)
+    assert rows(central, "SELECT bom_check FROM flow WHERE sku = 'A'") == [("1",)]
+
+
+def test_repush_after_failed_local_cleanup_is_skipped(replica, central, monkeypatch):
+    execute(replica.local_path,
+            "INSERT INTO flow (sku, bom_check, pic_download) VALUES ('C', '0', '0')",
+            "UPDATE flow SET bom_check = '1' WHERE sku = 'A'")
+
+    def fail(*args):
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(replica, "_clear_pushed", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        replica.sync_now()
+    monkeypatch.undo()
+
+    # 中心数据库已记录推送进度，重新推送时跳过，不会重复插入或误报冲突
+    execute(replica.local_path, "UPDATE flow SET pic_download = '1' WHERE sku = 'C'")
+    assert replica.sync_now() == (1, 0)
+    assert rows(central, "SELECT sku, bom_check, pic_download FROM flow ORDER BY sku") == [
+        ("A", "1", "0"), ("B", "0", "0"), ("C", "0", "1")]
+    assert replica.pending_changes() == 0
+
+
+def test_offline_start_uses_existing_replica(replica, tmp_path):
+    execute(replica.local_path, "UPDATE flow SET bom_check = '1' WHERE sku = 'A'")
+    offline = LocalReplica(str(tmp_path / "missing" / "central.db"), replica.local_path, str(tmp_path / "logs"))
+
+    assert offline.prepare() == replica.local_path
+    assert offline.pending_changes() == 1
+    assert os.path.exists(replica.local_path)
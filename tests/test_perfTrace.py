@@ -0,0 +1,32 @@
+import pytest
+
+from modules.Script import perfTrace
+
+
+def test_decorated_slot_drops_extra_signal_args():
+    @perfTrace.trace("slot")
+    def on_clicked(item):
+        return item
+
+    # clicked 等信号多传的 checked 参数被丢弃
+    assert on_clicked("A", True) == "A"
+
+
+def test_traced_methods_keep_all_args():
+    class Manager:
+        def get(self, sku, column="all"):
+            return sku, column
+
+    manager = perfTrace.trace_methods(Manager(), "db")
+    assert manager.get("A", "bom") == ("A", "bom")
+    with pytest.raises(TypeError):
+        manager.get("A", "bom", "extra")
+
+
+def test_unwritable_log_dir_falls_back_to_user_dir(tmp_path, monkeypatch):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setattr(perfTrace, "user_log_dir", lambda: str(tmp_path / "user" / "logs"))
+
+    assert perfTrace.resolve_log_dir(str(blocker / "logs")) == str(tmp_path / "user" / "logs")
+    assert perfTrace.configure(str(blocker / "logs")) is False
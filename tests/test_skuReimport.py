@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from modules.Script.skuReimport import reimport_drawing
+
+
+class FakeDatabaseManager:
+    """与数据库管理器相同的方法，每个方法各自提交"""
+
+    def __init__(self, db_path, result=True):
+        self.db_path = db_path
+        self.result = result
+
+    def _execute(self, sql, params):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def delete_data_by_sku(self, sku):
+        self._execute("DELETE FROM drawing WHERE SKU = ?", (sku,))
+
+    def delete_pic_by_sku(self, sku):
+        self._execute("DELETE FROM real_pic WHERE sku = ?", (sku,))
+
+    def import_excel_to_drawing(self, db_path, sku, file_path):
+        # 导入到一半失败时也已经写入了部分数据
+        self._execute("INSERT INTO drawing (SKU, drawing_path) VALUES (?, ?)", (sku, file_path))
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "efai.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE drawing (id INTEGER PRIMARY KEY, SKU TEXT, drawing_path TEXT);
+        CREATE TABLE real_pic (sku TEXT, image_path TEXT);
+        INSERT INTO drawing (SKU, drawing_path) VALUES ('A', 'a1.png'), ('A', 'a2.png'), ('B', 'b1.png');
+        INSERT INTO real_pic VALUES ('A', 'p1.jpg');
+    """)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def snapshot(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return (conn.execute("SELECT * FROM drawing ORDER BY id").fetchall(),
+                conn.execute("SELECT * FROM real_pic").fetchall())
+    finally:
+        conn.close()
+
+
+def test_success_replaces_old_rows(db_path):
+    assert reimport_drawing(FakeDatabaseManager(db_path), db_path, "A", "new.xlsx")
+    drawings, pics = snapshot(db_path)
+    assert [row[1:] for row in drawings] == [("B", "b1.png"), ("A", "new.xlsx")]
+    assert pics == []
+
+
+def test_failed_import_restores_old_rows(db_path):
+    before = snapshot(db_path)
+    assert not reimport_drawing(FakeDatabaseManager(db_path, result=False), db_path, "A", "new.xlsx")
+    assert snapshot(db_path) == before
+
+
+def test_import_error_restores_old_rows(db_path):
+    before = snapshot(db_path)
+    with pytest.raises(ValueError):
+        reimport_drawing(FakeDatabaseManager(db_path, result=ValueError("bad workbook")), db_path, "A", "new.xlsx")
+    assert snapshot(db_path) == before